@@ -0,0 +1,289 @@
+import math  # Import math for the exact t distribution of small samples
+
+import numpy as np  # Import NumPy for vectorized statistics
+import pandas as pd  # Import pandas for data manipulation
+from statistics import NormalDist  # Standard library normal distribution for critical values
+
+
+# Function to get P(|T| < t) for a Student t distribution with an integer number of degrees of freedom (Abramowitz & Stegun 26.7.3-4)
+def t_coverage(t, dof):
+    theta = math.atan(t / math.sqrt(dof))
+    cos2 = math.cos(theta) ** 2
+    if dof % 2 == 0:
+        term = total = 1.0
+        for k in range(1, dof // 2):
+            term *= cos2 * (2 * k - 1) / (2 * k)
+            total += term
+        return math.sin(theta) * total
+    term = total = math.cos(theta) if dof > 1 else 0.0
+    for k in range(1, (dof - 1) // 2):
+        term *= cos2 * (2 * k) / (2 * k + 1)
+        total += term
+    return 2 / math.pi * (theta + math.sin(theta) * total)
+
+
+# Function to refine a t critical value with Newton steps on the exact distribution function
+def refine_t_critical(t, dof, confidence, steps=3):
+    log_density = math.lgamma((dof + 1) / 2) - math.lgamma(dof / 2) - 0.5 * math.log(dof * math.pi)
+    for _ in range(steps):
+        density = math.exp(log_density - (dof + 1) / 2 * math.log1p(t * t / dof))
+        t -= (t_coverage(t, dof) - confidence) / (2 * density)
+    return t
+
+
+# Function to get the two-sided t critical value for an array of degrees of freedom
+def t_critical(dof, confidence=0.95):
+    dof = np.asarray(dof, dtype=float)
+    p = 1 - (1 - confidence) / 2  # Upper tail probability
+    z = NormalDist().inv_cdf(p)  # Normal critical value used by the expansion
+
+    # Cornish-Fisher expansion of the t quantile in powers of 1/dof (Abramowitz & Stegun 26.7.5)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        g1 = (z**3 + z) / 4
+        g2 = (5 * z**5 + 16 * z**3 + 3 * z) / 96
+        g3 = (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / 384
+        g4 = (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / 92160
+        t = z + g1 / dof + g2 / dof**2 + g3 / dof**3 + g4 / dof**4
+
+        # The expansion is poor for very small samples, so use the closed forms there
+        t = np.where(dof == 1, np.tan(np.pi * (p - 0.5)), t)
+        t = np.where(dof == 2, (2 * p - 1) / np.sqrt(2 * p * (1 - p)), t)
+        for small in np.unique(dof[(dof >= 3) & (dof < 10) & (dof == np.round(dof))]):
+            # The expansion is up to 0.1% off below 10 degrees of freedom, so refine whole values on the exact distribution
+            t = np.where(dof == small, refine_t_critical(float(t[dof == small].flat[0]), int(small), confidence), t)
+    return np.where(dof >= 1, t, np.nan)
+
+
+# Function to compute confidence intervals and significance flags for every division, period and metric at once
+def compute_intervals(filtered_data, division_col, period_col_name, boolean_metrics, numeric_metrics, confidence=0.95):
+    metric_names = list(boolean_metrics) + list(numeric_metrics)
+
+    # Cast all metrics to float in one block so Y/N answers become 0/1
+    values = filtered_data[metric_names].astype(float)
+    squares = values ** 2
+    group_keys = [filtered_data[division_col], filtered_data[period_col_name]]
+
+    # One grouped pass gives counts, sums and sums of squares for every metric
+    counts = values.notna().groupby(group_keys).sum()
+    sums = values.groupby(group_keys).sum()
+    sum_squares = squares.groupby(group_keys).sum()
+
+    # Overall average per period for every metric, aligned to the division rows
+    overall = values.groupby(filtered_data[period_col_name]).mean()
+    overall = overall.reindex(counts.index.get_level_values(1)).to_numpy()
+
+    n = counts.to_numpy(dtype=float)
+    s = sums.to_numpy(dtype=float)
+    ss = sum_squares.to_numpy(dtype=float)
+    is_boolean = np.isin(metric_names, list(boolean_metrics))[np.newaxis, :]  # Broadcast over rows
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = s / n
+
+        # Wilson score interval for Yes/No metrics
+        z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+        denominator = 1 + z**2 / n
+        centre = (mean + z**2 / (2 * n)) / denominator
+        spread = z * np.sqrt(mean * (1 - mean) / n + z**2 / (4 * n**2)) / denominator
+        wilson_lower = centre - spread
+        wilson_upper = centre + spread
+
+        # Student t interval for numeric metrics
+        variance = (ss - n * mean**2) / (n - 1)
+        margin = t_critical(n - 1, confidence) * np.sqrt(np.clip(variance, 0, None) / n)
+        t_lower = mean - margin
+        t_upper = mean + margin
+
+        std = np.where(is_boolean, np.sqrt(np.clip(mean * (1 - mean), 0, None)), np.sqrt(np.clip(variance, 0, None)))  # Standard deviation of the answers
+
+    lower = np.where(is_boolean, wilson_lower, t_lower)
+    upper = np.where(is_boolean, wilson_upper, t_upper)
+
+    # A division is flagged when its interval does not contain the overall average
+    significant = (lower > overall) | (upper < overall)
+
+    # Reshape the division x metric matrices into one long table
+    index = counts.index
+    intervals = pd.DataFrame({
+        division_col: np.repeat(index.get_level_values(0), len(metric_names)),
+        period_col_name: np.repeat(index.get_level_values(1), len(metric_names)),
+        'metric': np.tile(metric_names, len(index)),
+        'mean': mean.ravel(),
+        'count': n.ravel().astype(int),
+        'lower': lower.ravel(),
+        'upper': upper.ravel(),
+        'std': std.ravel(),
+        'overall_avg': overall.ravel(),
+        'significant': significant.ravel(),
+    })
+    return intervals
+
+
+# Function to stack the rows of several segments of the data under a segment key, rows in two segments appear twice.
+# The stacked rows get fresh labels, so joins on the index (e.g. in option_counts) never pair the two copies of a row
+def stack_segments(data, masks, columns, segment_col='segment'):
+    positions = [np.flatnonzero(mask) for mask in masks.values()]
+    stacked = data.iloc[np.concatenate(positions)][columns].reset_index(drop=True)
+    stacked[segment_col] = np.repeat(list(masks), [len(p) for p in positions])
+    return stacked
+
+
+# Function to compute the intervals of every segment, division and metric in one grouped pass
+def compare_segments(data, masks, division_col, boolean_metrics, numeric_metrics, confidence=0.95, segment_col='segment'):
+    stacked = stack_segments(data, masks, [division_col] + list(boolean_metrics) + list(numeric_metrics), segment_col)
+    # The segment takes the place of the period, so the overall average is computed per segment
+    return compute_intervals(stacked, division_col, segment_col, boolean_metrics, numeric_metrics, confidence)
+
+
+# Function to compute the difference between two segments for every division of a metric, with its confidence interval
+def segment_differences(intervals, division_col, metric, first, second, boolean=False, confidence=0.95, segment_col='segment'):
+    scores = intervals[intervals['metric'] == metric].pivot(index=division_col, columns=segment_col, values=['mean', 'count', 'std'])
+    scores = scores.reindex(columns=[first, second], level=1)
+    n1, n2 = scores[('count', first)].to_numpy(dtype=float), scores[('count', second)].to_numpy(dtype=float)
+    s1, s2 = scores[('std', first)].to_numpy(), scores[('std', second)].to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        difference = scores[('mean', second)].to_numpy() - scores[('mean', first)].to_numpy()
+        standard_error = np.sqrt(s1**2 / n1 + s2**2 / n2)
+        if boolean:
+            critical = NormalDist().inv_cdf(1 - (1 - confidence) / 2)  # Normal interval of a difference of proportions
+        else:
+            critical = t_critical(np.minimum(n1, n2) - 1, confidence)  # Conservative degrees of freedom for Welch's interval
+    margin = critical * standard_error
+
+    differences = pd.DataFrame({
+        division_col: scores.index,
+        f'mean {first}': scores[('mean', first)].to_numpy(),
+        f'count {first}': np.nan_to_num(n1).astype(int),
+        f'mean {second}': scores[('mean', second)].to_numpy(),
+        f'count {second}': np.nan_to_num(n2).astype(int),
+        'difference': difference,
+        'lower': difference - margin,
+        'upper': difference + margin,
+    })
+    differences['significant'] = (differences['lower'] > 0) | (differences['upper'] < 0)  # The interval excludes no difference
+    return differences.sort_values(by='difference', ascending=False).reset_index(drop=True)
+
+
+# Function to count the answers of a single or multi select metric as a division/period x option matrix
+def option_counts(filtered_data, division_col, period_col_name, metric, multi_select=False):
+    answers = filtered_data[metric]
+    if multi_select:
+        # Split the '|' separated answers into one row per selected option
+        answers = answers.str.split('|').explode().str.strip()
+
+    # Attach the division and period of every answer (explode keeps the original row index)
+    answers = filtered_data[[division_col, period_col_name]].join(answers.rename('option'))
+
+    # Pivot the answer counts into one column per option
+    counts = answers.groupby([division_col, period_col_name, 'option']).size().unstack('option', fill_value=0)
+    counts.columns.name = None
+    return counts
+
+
+# Function to count the answers of several select metrics in one grouped pass, returning {metric: option_counts matrix}
+def batch_option_counts(filtered_data, division_col, period_col_name, metrics, multi_select_metrics=()):
+    # Stack the answers of all metrics into one long table, the (metric, option) pairs share one index
+    answers = []
+    for metric in metrics:
+        column = filtered_data[metric]
+        if metric in multi_select_metrics:
+            column = column.str.split('|').explode().str.strip()
+        answers.append(pd.DataFrame({'metric': metric, 'option': column}))
+    answers = pd.concat(answers).join(filtered_data[[division_col, period_col_name]])
+
+    sizes = answers.groupby([division_col, period_col_name, 'metric', 'option']).size()
+    counts = {}
+    for metric in metrics:
+        if metric in sizes.index.get_level_values('metric'):
+            counts[metric] = sizes.xs(metric, level='metric').unstack('option', fill_value=0).sort_index(axis=1)
+        else:
+            counts[metric] = option_counts(filtered_data.iloc[:0], division_col, period_col_name, metric)  # No answers in this filter state
+        counts[metric].columns.name = None
+    return counts
+
+
+# Function to compute the difference in the share of every option between two segments, per division and overall
+def option_differences(counts, division_col, first, second, segment_col='segment'):
+    overall = counts.groupby(level=segment_col).sum()
+    overall.index = pd.MultiIndex.from_product([['Overall Average'], overall.index], names=counts.index.names)
+    counts = pd.concat([overall, counts])
+    percentage = counts.div(counts.sum(axis=1), axis=0) * 100
+    shares = percentage.unstack(segment_col)
+    return (shares.xs(second, axis=1, level=1) - shares.xs(first, axis=1, level=1)).reindex(counts.index.get_level_values(0).unique())
+
+
+# Function to look up the per-division/per-period scores of a Yes/No or numeric metric in the interval table
+def division_scores(intervals, division_col, period_col_name, metric):
+    scores = intervals[intervals['metric'] == metric]
+    average_metrics = scores[[division_col, period_col_name, 'mean', 'count', 'lower', 'upper', 'significant']]
+    average_metrics = average_metrics.sort_values(by='mean', ascending=False).reset_index(drop=True)
+    average_metrics['error_plus'] = average_metrics['upper'] - average_metrics['mean']  # Length of the upper error bar
+    average_metrics['error_minus'] = average_metrics['mean'] - average_metrics['lower']  # Length of the lower error bar
+
+    # Overall average of each period, as computed alongside the intervals
+    overall_avg = scores.groupby(period_col_name)['overall_avg'].first().rename(metric).reset_index()
+    return average_metrics, overall_avg
+
+
+# Function to aggregate metrics over every prefix of a hierarchy of columns in one grouped pass (grouping sets)
+def rollup_levels(data, level_cols, metrics):
+    values = data[list(metrics)].astype(float)
+    keys = [data[col] for col in level_cols]
+
+    # Only the finest level is grouped over the rows, every coarser level sums the groups of the level below
+    sums = values.groupby(keys, dropna=False).sum()
+    counts = values.notna().groupby(keys, dropna=False).sum()
+    responses = values.groupby(keys, dropna=False).size()
+    levels = {}
+    for depth in range(len(level_cols), 0, -1):
+        if depth < len(level_cols):
+            group = list(range(depth))
+            sums = sums.groupby(level=group, dropna=False).sum()
+            counts = counts.groupby(level=group, dropna=False).sum()
+            responses = responses.groupby(level=group, dropna=False).sum()
+        levels[depth] = (sums / counts.where(counts > 0), counts, responses)  # Means, answers per metric and rows per group
+    return levels
+
+
+# Function to look up the mean and number of answers of every metric for a path of the hierarchy, e.g. (division, feature 1)
+def rollup_node(levels, path):
+    means, counts, _ = levels[len(path)]
+    key = path if len(path) > 1 else path[0]
+    return means.loc[key], counts.loc[key]
+
+
+# Function to look up the children of a path of the hierarchy with the mean of a metric, or their number of rows without one
+def rollup_children(levels, path, metric=None):
+    means, counts, responses = levels[len(path) + 1]
+    key = path if len(path) > 1 else path[0]
+    if metric is None:
+        return responses.loc[key], responses.loc[key]
+    return means.loc[key][metric], counts.loc[key][metric]
+
+
+# Function to draw about per_stratum random rows from every combination of the key columns
+def stratified_sample(data, keys, per_stratum, seed=0):
+    # Bernoulli sampling with a per-stratum rate only touches the key columns of the full data
+    codes = data.groupby(keys, sort=False).ngroup().to_numpy()
+    sizes = np.bincount(codes[codes >= 0])
+    rate = np.minimum(1.0, per_stratum / sizes)
+    keep = (codes >= 0) & (np.random.default_rng(seed).random(len(data)) < rate[codes])
+    return data[keep], sizes[codes[keep]]  # Sampled rows and the full size of their stratum
+
+
+# Function to approximate the intervals of compute_intervals from a stratified sample by division and period
+def approximate_intervals(filtered_data, division_col, period_col_name, boolean_metrics, numeric_metrics,
+                          per_stratum=200, confidence=0.95, seed=0):
+    keys = [division_col, period_col_name]
+    sample, row_sizes = stratified_sample(filtered_data, keys, per_stratum, seed)
+    intervals = compute_intervals(sample, division_col, period_col_name, boolean_metrics, numeric_metrics, confidence)
+
+    # Strata are sampled unequally, so weight each division by its full size for the overall average
+    stratum_sizes = pd.Series(row_sizes, index=sample.index).groupby([sample[division_col], sample[period_col_name]]).first().rename('stratum_size')
+    intervals = intervals.join(stratum_sizes, on=keys)
+    weights = intervals['stratum_size'].where(intervals['mean'].notna(), 0)
+    weighted = (intervals['mean'].fillna(0) * weights).groupby([intervals[period_col_name], intervals['metric']]).transform('sum')
+    intervals['overall_avg'] = weighted / weights.groupby([intervals[period_col_name], intervals['metric']]).transform('sum')
+    intervals['significant'] = (intervals['lower'] > intervals['overall_avg']) | (intervals['upper'] < intervals['overall_avg'])
+    return intervals.drop(columns='stratum_size'), len(sample)
@@ -0,0 +1,149 @@
+import hashlib  # Import hashlib for the ETags of responses
+import json  # Import json for the response bodies
+import os  # Import os to read the configured port
+import threading  # Import threading to serve next to the Streamlit server
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Import the standard library HTTP server
+from urllib.parse import parse_qsl, urlsplit  # Import the query string parser
+
+from dataset import DIVISION_CANDIDATES, METRICS_START, PERIOD_COL  # Import the dataset layout
+from export import iter_export_tables  # Import the aggregates behind every chart, shared with the bulk export
+
+API_HOST = os.environ.get('DASHBOARD_API_HOST', '127.0.0.1')  # Local only by default
+API_PORT = int(os.environ.get('DASHBOARD_API_PORT', '0'))  # Port of the JSON API, off (0) unless one is set
+
+
+# Error answered with a status code and a JSON message
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Function to serialize DataFrames as lists of records, with NaN as null
+def records(frame):
+    return json.loads(frame.to_json(orient='records'))
+
+
+# Read-only JSON API over the datasets of a registry, sharing the derived artifacts cache of the app
+class AggregateAPI:
+    def __init__(self, registry, cache, host=API_HOST, port=API_PORT):
+        self.registry = registry
+        self.cache = cache
+        self.host = host
+        self.port = port
+        self._server = None
+
+    # Function to serve the API from a daemon thread
+    def start(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                api.handle(self)
+
+            def log_message(self, format, *args):
+                pass  # Keep the Streamlit logs readable
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='aggregate-api', daemon=True).start()
+        return self
+
+    # Function to stop serving
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    # Function to answer one request, with 304 Not Modified when the client already has the current response
+    def handle(self, request):
+        url = urlsplit(request.path)
+        params = parse_qsl(url.query)
+        try:
+            if url.path == '/api/datasets':
+                version, build = self.registry.names(), lambda: {'datasets': self.registry.names()}
+            elif url.path == '/api/metrics':
+                version, build = self._metrics(params)
+            elif url.path == '/api/aggregates':
+                version, build = self._aggregates(params)
+            else:
+                raise APIError(404, f"Unknown endpoint {url.path}")
+
+            # The ETag only depends on the dataset version and the query, so it is known before computing anything
+            etag = '"' + hashlib.sha1(repr((url.path, version, sorted(params))).encode()).hexdigest() + '"'
+            if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+                request.send_response(304)
+                request.send_header('ETag', etag)
+                request.end_headers()
+                return
+            body = self.cache.get_or_compute('api', etag, lambda: json.dumps(build()).encode())
+            status = 200
+        except APIError as e:
+            status, etag, body = e.status, None, json.dumps({'error': str(e)}).encode()
+        except Exception as e:  # E.g. a dataset that fails to load, answered instead of dropping the connection
+            status, etag, body = 500, None, json.dumps({'error': f"{type(e).__name__}: {e}"}).encode()
+
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        if etag:
+            request.send_header('ETag', etag)
+            request.send_header('Cache-Control', 'no-cache')  # Clients keep the response but revalidate it
+        request.end_headers()
+        request.wfile.write(body)
+
+    # Function to get the dataset version named in the query
+    def _dataset(self, params):
+        names = self.registry.names()
+        name = dict(params).get('dataset', names[0])
+        if name not in names:
+            raise APIError(404, f"Unknown dataset {name}")
+        return name, self.registry.get(name)
+
+    # Function to describe the metrics and filter columns of a dataset
+    def _metrics(self, params):
+        name, dataset = self._dataset(params)
+        data = dataset.data
+
+        def build():
+            types = {'Y/N': dataset.boolean_cols, 'numeric': dataset.numeric_cols,
+                     'Single Select': dataset.single_select_cols, 'Multi Select': dataset.multi_select_cols}
+            return {
+                'dataset': name,
+                'metrics': [{'metric': data.columns[col], 'type': kind} for kind, cols in types.items() for col in cols],
+                'divisions': [data.columns[col] for col in DIVISION_CANDIDATES],
+                'filters': {data.columns[col]: [str(v) for v in values] for col, values in dataset.values.items()},
+            }
+        return (name, dataset.version), build
+
+    # Function to get the aggregates, overall averages and option distributions of metrics for a filter state
+    def _aggregates(self, params):
+        name, dataset = self._dataset(params)
+        data = dataset.data
+        division_col = dict(params).get('division', data.columns[DIVISION_CANDIDATES[0]])
+        if division_col not in data.columns[DIVISION_CANDIDATES]:
+            raise APIError(400, f"Unknown division column {division_col}")
+        metrics = [value for key, value in params if key == 'metric']
+        unknown = [metric for metric in metrics if metric not in data.columns[METRICS_START:]]
+        if not metrics or unknown:
+            raise APIError(400, f"Unknown metrics {unknown}" if unknown else "At least one metric parameter is required")
+
+        # Filters are COLUMN=VALUE pairs like on the command line, matched against the values of the filter columns
+        filters = {}
+        for key, value in params:
+            if key != 'filter':
+                continue
+            col_name, _, text = value.partition('=')
+            options = {str(v): v for col, values in dataset.values.items() if data.columns[col] == col_name for v in values}
+            if not options:
+                raise APIError(400, f"Cannot filter on {col_name}, use one of {[data.columns[col] for col in DIVISION_CANDIDATES + [PERIOD_COL]]}")
+            if text not in options:
+                raise APIError(400, f"Unknown value {text} of {col_name}")
+            filters.setdefault(col_name, []).append(options[text])
+
+        def build():
+            tables = {'aggregates': [], 'overall': [], 'options': []}
+            for table, chunk in iter_export_tables(data, division_col, filters, metrics=metrics):
+                tables[table].extend(records(chunk))
+            return {'dataset': name, 'version': dataset.version, 'division': division_col, 'filters': {k: [str(v) for v in values] for k, values in filters.items()}, **tables}
+        return (name, dataset.version), build
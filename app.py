@@ -1,59 +1,320 @@
+import os  # Import os to read the dataset location from the environment
+import sqlite3  # Import sqlite3 for the errors of the disk cache
+import threading  # Import threading to guard the background refinements shared by sessions
+import time  # Import time to poll the progress of the dataset load
 import streamlit as st  # Import Streamlit for building the web app
+from concurrent.futures import ThreadPoolExecutor  # Import the thread pool for background refinement
 import pandas as pd  # Import pandas for data manipulation
-import plotly.express as px  # Import Plotly Express for creating plots
-import plotly.graph_objects as go  # Import Plotly Graph Objects for advanced plotting
-from streamlit_plotly_events import plotly_events  # Import plotly_events for handling Plotly events in Streamlit
+from aggregates import approximate_intervals, batch_option_counts, compare_segments, compute_intervals, division_scores, option_counts, option_differences, rollup_children, rollup_levels, rollup_node, segment_differences, stack_segments  # Import the batched aggregations
+from charts import TOP_K_OPTIONS, build_breakdown_chart, build_difference_chart, build_score_chart, build_select_chart  # Import the shared chart builders
+from export import EXPORT_FORMATS, export_to_bytes  # Import the bulk export of all aggregates
+from dataset import DIVISION_CANDIDATES, METRICS_START, PERIOD_COL  # Import the dataset layout
+from registry import DatasetRegistry, discover_datasets  # Import the lazily loaded datasets served by this instance
+from cache_manager import CacheManager  # Import the memory-budgeted cache of derived artifacts
+from disk_cache import DISK_CACHE_MB, DiskCache  # Import the cache on disk shared by processes and restarts
+from api import API_PORT, AggregateAPI  # Import the JSON API served next to the dashboard
+from payload import PAYLOAD_DECIMALS, PERCENT_DECIMALS, PayloadMeter  # Import the compact encoding of figures sent to the browser
 
 # Set page configuration to wide layout
 st.set_page_config(layout="wide")
 
 # Load the dataset
-file_path = r'data_cleaned_dummy.xlsx'  # Path to the Excel file containing the data
-data = pd.read_excel(file_path)  # Read the Excel file into a pandas DataFrame
+data_path = os.environ.get('DASHBOARD_DATA', r'data_cleaned_dummy.xlsx')  # Excel file containing the data, or a directory of survey workbooks
+
+# Function to get the cache on disk shared by the processes of a deployment, None when it is disabled or cannot be opened
+@st.cache_resource
+def get_disk_cache():
+    if DISK_CACHE_MB == 0:
+        return None
+    try:
+        return DiskCache()
+    except (OSError, sqlite3.Error):  # E.g. a read-only file system, run without it
+        return None
+
+# Function to get the datasets shared by all sessions, each loaded on first access and reloaded in the background when it changes
+@st.cache_resource
+def get_registry(data_path):
+    return DatasetRegistry(discover_datasets(data_path), disk_cache=get_disk_cache())
+
+registry = get_registry(data_path)
+dataset_names = registry.names()
+
+# Select the survey from the sidebar, or from ?dataset= in the URL so links can point at one survey
+if len(dataset_names) > 1:
+    if st.session_state.get('dataset') not in dataset_names:
+        requested = st.query_params.get('dataset')
+        st.session_state['dataset'] = requested if requested in dataset_names else dataset_names[0]
+    with st.sidebar:
+        dataset_name = st.selectbox("Select Survey", dataset_names, key='dataset')
+    st.query_params['dataset'] = dataset_name
+else:
+    dataset_name = dataset_names[0]
+
+# Start loading the survey in the background, the sidebar only needs its column names
+dataset_load = registry.load(dataset_name)
+columns = registry.columns(dataset_name)
+
+# Function to get the cache of derived artifacts shared by all sessions
+@st.cache_resource
+def get_cache():
+    return CacheManager(disk=get_disk_cache())
+
+cache = get_cache()
+
+# Function to get the meter of the bytes sent per chart shared by all sessions
+@st.cache_resource
+def get_payload_meter():
+    return PayloadMeter()
+
+payload = get_payload_meter()
+
+# Function to start the JSON API once per process, sharing the datasets and caches of the dashboard
+@st.cache_resource
+def get_api(data_path, port):
+    if port == 0:
+        return None
+    try:
+        return AggregateAPI(get_registry(data_path), get_cache(), port=port).start()
+    except OSError:  # The port is taken, e.g. by another instance of the dashboard
+        return None
+
+get_api(data_path, API_PORT)
 
 # Sidebar for selecting the division column
 with st.sidebar:
-    division_col_index = st.selectbox("Select Division Column", options=[0, 2, 3], format_func=lambda x: data.columns[x])
-    division_col = data.columns[division_col_index]
-    feature_columns = [0, 2, 3]
+    division_col_index = st.selectbox("Select Division Column", options=DIVISION_CANDIDATES, format_func=lambda x: columns[x])
+    division_col = columns[division_col_index]
+    feature_columns = list(DIVISION_CANDIDATES)
     feature_columns.remove(division_col_index)
     feature_1_col = feature_columns[0]
     feature_2_col = feature_columns[1]
+    top_k_options = st.slider("Options shown in select questions", min_value=3, max_value=15, value=TOP_K_OPTIONS)  # Remaining options are folded into "Other"
+    preview_mode = st.toggle("Fast preview", value=False, help="Show an approximate chart from a sample of each division first, then refine it to the exact result")
+
+# Show the progress of the load instead of a blank page while the survey is read
+if not dataset_load.done():
+    load_started = time.monotonic()
+    load_bar = st.progress(0.0, text="Loading the survey...")
+    while not dataset_load.done():
+        fraction, stage = registry.progress(dataset_name)
+        load_bar.progress(fraction, text=f"{stage}... ({time.monotonic() - load_started:.0f} s)")
+        time.sleep(0.2)
+    load_bar.empty()
+
+dataset = registry.get(dataset_name)  # Latest complete version, kept for the whole rerun
+data = dataset.data
+
+# Let the user know when a new version of the dataset has been swapped in
+previous_version = st.session_state.get('dataset_version')
+if previous_version is not None and previous_version[0] == dataset_name and previous_version[1] != dataset.version:
+    st.toast("The dataset has been updated")
+st.session_state['dataset_version'] = (dataset_name, dataset.version)
 
 # Define constant columns
-period_col = 1  # Assuming 'Period' is always in the second column
-metrics_cols = list(range(4, data.shape[1]))  # Assuming metrics start from the 5th column
-
-# Convert period_col to categorical if it is numeric
-if pd.api.types.is_numeric_dtype(data.iloc[:, period_col]):
-    data.iloc[:, period_col] = data.iloc[:, period_col].astype(str)
-
-# Transform Yes/No columns to boolean and identify other types
-boolean_cols = []
-numeric_cols = []
-single_select_cols = []
-multi_select_cols = []
-
-for col in metrics_cols:
-    col_name = data.columns[col]
-    if '(Y/N)' in col_name:
-        data.iloc[:, col] = data.iloc[:, col].str.lower().map({'yes': True, 'y': True, 'no': False, 'n': False})
-        boolean_cols.append(col)
-    elif '(Single Select)' in col_name:
-        single_select_cols.append(col)
-    elif '(Multi Select)' in col_name:
-        multi_select_cols.append(col)
-    else:
-        numeric_cols.append(col)
+period_col = PERIOD_COL  # Assuming 'Period' is always in the second column
+metrics_cols = list(range(METRICS_START, data.shape[1]))  # Assuming metrics start from the 5th column
+
+# Type of every metric column, identified when the dataset version was built
+boolean_cols, numeric_cols, single_select_cols, multi_select_cols = dataset.boolean_cols, dataset.numeric_cols, dataset.single_select_cols, dataset.multi_select_cols
 
 
 # Define possible metrics for user selection based on survey responses or data columns
 metrics_options = data.columns[metrics_cols].tolist()
 
-# Function to update the bar chart based on the selected division
-def update_bar_chart(division_name):
-    metrics_avg = division_data.mean().sort_values(ascending=True)
-    metrics_count = division_data.count()
+# Sidebar section to keep only the respondents who gave some answers, on top of the filters of every tab
+with st.sidebar:
+    with st.expander("Filter by answers"):
+        answer_metrics = st.multiselect("Questions:", boolean_cols + single_select_cols + multi_select_cols, format_func=lambda x: data.columns[x], key="answer_metrics")
+        answer_filters = {}  # Column position -> answers kept, looked up in the answer index of the dataset version
+        for col in answer_metrics:
+            format_answer = (lambda x: "Yes" if x else "No") if col in boolean_cols else str
+            selected_answers = st.multiselect(f"{data.columns[col]}:", dataset.answer_values[col], format_func=format_answer, key=f"answers_{col}")
+            if selected_answers:  # A question without answers picked does not filter yet
+                answer_filters[col] = selected_answers
+answer_key = tuple((col, tuple(values)) for col, values in answer_filters.items())
+
+PREVIEW_ROWS_PER_STRATUM = 200  # Responses sampled per division and period in preview mode
+MAX_REFINEMENTS = 32  # Filter states whose background computation is tracked for the preview mode
+REFINEMENT_POLL_SECONDS = 0.5  # How often a previewed chart checks whether its exact result is ready
+SEGMENT_LABELS = ['A', 'B']  # Names of the two segments of the comparison tab
+GRID_COLUMNS = 3  # Charts per row of the metric grid
+GRID_CHART_HEIGHT = 350  # Height of the small charts of the metric grid in pixels
+GRID_WORKERS = 4  # Figures of the metric grid built at the same time
+RESPONSE_PAGE_SIZE = 50  # Responses shown per page under the drill-down
+
+# Function to apply the Period, feature and answer filters to the data
+def filter_data(selected_period, selected_feature_2, selected_feature_1):
+    return data[dataset.mask({period_col: selected_period, feature_2_col: selected_feature_2, feature_1_col: selected_feature_1, **answer_filters})]
+
+# Function to build the cache key of a filter state for the current dataset version
+def filter_key(selected_period, selected_feature_2, selected_feature_1, division_col):
+    return (dataset_name, dataset.version, tuple(selected_period), tuple(selected_feature_2), tuple(selected_feature_1), answer_key, division_col)
+
+# Function to build a compact figure once per key and rebuild it from its cached JSON afterwards
+def cached_figure(key, build, decimals=PAYLOAD_DECIMALS):
+    import plotly.io as pio  # Deferred until the first chart is shown
+    return pio.from_json(cache.get_or_compute('figures', key, lambda: payload.compact(key[0], build(), decimals).to_json()))
+
+# Function to check whether every Period and feature value is selected and no answer is filtered on
+def is_unfiltered(selected_period, selected_feature_2, selected_feature_1):
+    return (not answer_filters and len(selected_period) == len(dataset.values[period_col]) and
+            len(selected_feature_2) == len(dataset.values[feature_2_col]) and
+            len(selected_feature_1) == len(dataset.values[feature_1_col]))
+
+# Function to get the confidence intervals for all divisions and metrics of a filter state
+def get_intervals(selected_period, selected_feature_2, selected_feature_1, division_col):
+    if is_unfiltered(selected_period, selected_feature_2, selected_feature_1):
+        return dataset.get_default_intervals(division_col)  # Shared by all sessions, computed once per dataset version
+    return get_filtered_intervals(selected_period, selected_feature_2, selected_feature_1, division_col)
+
+# Function to compute confidence intervals for all divisions and metrics of a filter state (cached per dataset version and filter state)
+def get_filtered_intervals(selected_period, selected_feature_2, selected_feature_1, division_col):
+    def compute():
+        filtered_data = filter_data(selected_period, selected_feature_2, selected_feature_1)
+        return compute_intervals(filtered_data, division_col, data.columns[period_col],
+                                 data.columns[boolean_cols], data.columns[numeric_cols])
+    return cache.get_or_compute('intervals', filter_key(selected_period, selected_feature_2, selected_feature_1, division_col), compute)
+
+# Function to compute the intervals of a filter state from a stratified sample (cached per dataset version and filter state)
+def get_sample_intervals(selected_period, selected_feature_2, selected_feature_1, division_col):
+    def compute():
+        filtered_data = filter_data(selected_period, selected_feature_2, selected_feature_1)
+        intervals, sampled_rows = approximate_intervals(filtered_data, division_col, data.columns[period_col],
+                                                        data.columns[boolean_cols], data.columns[numeric_cols],
+                                                        per_stratum=PREVIEW_ROWS_PER_STRATUM)
+        return intervals, sampled_rows, len(filtered_data)
+    return cache.get_or_compute('sample_intervals', filter_key(selected_period, selected_feature_2, selected_feature_1, division_col), compute)
+
+# Function to get the shared background executor, its computations keyed by filter state, and their lock
+@st.cache_resource
+def get_refinements():
+    return ThreadPoolExecutor(max_workers=2), {}, threading.Lock()
+
+# Function to compute the exact intervals of a filter state into the 'intervals' cache in the background.
+# The result is left to the cache (and its memory budget), the future only tells when it is there
+def refine_intervals(selected_period, selected_feature_2, selected_feature_1, division_col):
+    get_filtered_intervals(selected_period, selected_feature_2, selected_feature_1, division_col)
+
+# Function to start (or reuse) the exact computation of the intervals of a filter state in the background,
+# None when it failed so the caller computes it in the foreground
+def get_refinement(selected_period, selected_feature_2, selected_feature_1, division_col):
+    executor, refinements, lock = get_refinements()
+    key = filter_key(selected_period, selected_feature_2, selected_feature_1, division_col)
+    with lock:  # Shared by all sessions, only held to look up and submit (the data is filtered on the executor)
+        refinement = refinements.get(key)
+        if refinement is not None and refinement.done() and refinement.exception() is not None:
+            del refinements[key]  # Let the next preview of this filter state try again
+            return None
+        if refinement is None:
+            if len(refinements) >= MAX_REFINEMENTS:
+                refinements.pop(next(iter(refinements)))  # Forget the oldest filter state
+            refinement = refinements[key] = executor.submit(refine_intervals, selected_period, selected_feature_2, selected_feature_1, division_col)
+        return refinement
+
+# Function to rerun the script once the exact result behind a preview is ready, so the rest of the page is not held up meanwhile
+@st.fragment(run_every=REFINEMENT_POLL_SECONDS)
+def wait_for_refinement(refinement):
+    if refinement.done():
+        st.rerun()
+
+# Function to count the options of a select metric per division and period (cached per dataset version and filter state)
+def get_option_counts(selected_period, selected_feature_2, selected_feature_1, division_col, selected_metric):
+    def compute():
+        filtered_data = filter_data(selected_period, selected_feature_2, selected_feature_1)
+        return option_counts(filtered_data, division_col, data.columns[period_col], selected_metric,
+                             multi_select=selected_metric in data.columns[multi_select_cols])
+    key = filter_key(selected_period, selected_feature_2, selected_feature_1, division_col) + (selected_metric,)
+    return cache.get_or_compute('option_counts', key, compute)
+
+# Function to count the options of several select metrics per division and period in one grouped pass (cached per dataset version and filter state)
+def get_batch_option_counts(selected_period, selected_feature_2, selected_feature_1, division_col, metrics):
+    def compute():
+        filtered_data = filter_data(selected_period, selected_feature_2, selected_feature_1)
+        return batch_option_counts(filtered_data, division_col, data.columns[period_col], metrics,
+                                   multi_select_metrics=data.columns[multi_select_cols])
+    key = filter_key(selected_period, selected_feature_2, selected_feature_1, division_col) + (tuple(metrics),)
+    return cache.get_or_compute('batch_option_counts', key, compute)
+
+# Function to get the shared executor that builds the figures of the metric grid concurrently
+@st.cache_resource
+def get_figure_executor():
+    return ThreadPoolExecutor(max_workers=GRID_WORKERS, thread_name_prefix='figure-builder')
+
+# Function to capture the clicks on a chart, loading the events component only when a clickable chart is shown
+def plotly_events(fig, key):
+    from streamlit_plotly_events import plotly_events as chart_events  # Deferred, it also loads the Plotly figure classes
+    return chart_events(fig, key=key)
+
+# Function to get the averages of every division, feature 1 and feature 2 group under the filters of a tab,
+# all drill-down levels from one grouped pass (cached per dataset version and filter state)
+def get_rollup(selections):
+    filter_state = (selections[period_col], selections[feature_2_col], selections[feature_1_col])
+    return cache.get_or_compute('rollup', filter_key(*filter_state, division_col), lambda: rollup_levels(
+        filter_data(*filter_state), [division_col, data.columns[feature_1_col], data.columns[feature_2_col]], data.columns[boolean_cols + numeric_cols]))
+
+# Function to show the drill-down of a division, clicking a bar of a breakdown goes one level deeper
+def drill_down(division_name, selected_metric, key, selections):
+    levels = get_rollup(selections)  # Same responses as the table below the breakdowns
+    if division_name not in levels[1][2].index:
+        return  # No responses of the division under the current filters
+    metric = selected_metric if selected_metric in data.columns[boolean_cols] or selected_metric in data.columns[numeric_cols] else None
+    path = (division_name,)
+    with col_bar_chart:
+        metrics_slot = st.container()  # The metrics of the deepest selected group are shown above its breakdowns
+        for level_col in [feature_1_col, feature_2_col]:
+            children_avg, children_count = rollup_children(levels, path, metric)
+            figure_key = ('drill', metric) + path + filter_key(selections[period_col], selections[feature_2_col], selections[feature_1_col], division_col)
+            fig = cached_figure(figure_key, lambda: build_breakdown_chart(children_avg, children_count, path, data.columns[level_col], metric,
+                                                                          boolean=selected_metric in data.columns[boolean_cols]))
+            selected_points = plotly_events(fig, key=f"{key}_drill_{'_'.join(map(str, path))}")
+            children = {str(name): name for name in children_avg.index}  # The chart labels the groups as text
+            if not selected_points or str(selected_points[0].get('y')) not in children:
+                break
+            path = path + (children[str(selected_points[0]['y'])],)
+        with metrics_slot:
+            update_bar_chart(path, levels)
+        show_responses(path, selections, selected_metric, key)
+
+# Function to get the row positions of the responses of a drill-down group under the filters, sorted by a column (cached per dataset version and filter state)
+def get_respondent_rows(path, selections, sort_col, descending):
+    def compute():
+        rows = dataset.get_row_index(division_col_index)[path[0]]
+        groups = dict(zip([feature_1_col, feature_2_col], [[name] for name in path[1:]]))  # The feature groups drilled into
+        rows = rows[dataset.mask({**selections, **answer_filters}, rows=rows) & dataset.mask(groups, rows=rows)]
+        if sort_col is not None:
+            # Only the sort column of the group is read, its order is applied to the row positions
+            order = data.iloc[rows, sort_col].reset_index(drop=True).sort_values(ascending=not descending, kind='stable').index
+            rows = rows[order.to_numpy()]
+        return rows
+    key = (dataset_name, dataset.version, division_col, path, tuple((col, tuple(values)) for col, values in selections.items()), answer_key,
+           sort_col, descending)
+    return cache.get_or_compute('respondent_rows', key, compute)
+
+# Function to show the responses of a drill-down group one page at a time, only the rows and columns of the page are sent
+def show_responses(path, selections, selected_metric, key):
+    with st.expander(f"Responses of {' › '.join(map(str, path))}"):
+        default_cols = [division_col_index, period_col, feature_1_col, feature_2_col, list(data.columns).index(selected_metric)]
+        shown_cols = st.multiselect("Columns:", range(len(data.columns)), default=default_cols, format_func=lambda x: data.columns[x],
+                                    key=f"{key}_responses_columns")
+        sort_col = st.selectbox("Sort by:", [None] + shown_cols, format_func=lambda x: "Survey order" if x is None else data.columns[x],
+                                key=f"{key}_responses_sort")
+        descending = st.toggle("Descending", value=False, key=f"{key}_responses_descending")
+
+        rows = get_respondent_rows(path, selections, sort_col, descending)
+        pages = max(1, -(-len(rows) // RESPONSE_PAGE_SIZE))
+        page = st.number_input(f"Page (of {pages}):", min_value=1, max_value=pages, value=1, key=f"{key}_responses_page")
+        start = (page - 1) * RESPONSE_PAGE_SIZE
+        page_rows = rows[start:start + RESPONSE_PAGE_SIZE]
+        st.dataframe(data.iloc[page_rows, shown_cols], hide_index=True, use_container_width=True)
+        st.caption(f"Responses {min(start + 1, len(rows))}-{start + len(page_rows)} of {len(rows)}")
+
+# Function to update the bar chart based on the selected division, or the feature groups drilled into
+def update_bar_chart(path, levels):
+    import plotly.express as px  # Deferred until a division is clicked
+    # Average and number of responses of every metric for the group, looked up in the cached rollup
+    metrics_avg, metrics_count = rollup_node(levels, path)
+    metrics_avg = metrics_avg.sort_values(ascending=True)
+    metrics_count = metrics_count.reindex(metrics_avg.index)
     num_bars = len(metrics_avg)
     fig_height = 450  # Fixed height of the figure in pixels
     bar_height = 20  # Fixed height of each bar in pixels
@@ -63,7 +324,6 @@ def update_bar_chart(division_name):
         x=metrics_avg.values,
         y=metrics_avg.index,
         orientation='h',
-        text=metrics_avg.values,
         labels={'y': '', 'x': 'Average Score'},
         hover_data={'Number of responses': metrics_count.values}  # Add number of responses as hover data
     )
@@ -92,7 +352,7 @@ def update_bar_chart(division_name):
     )  # Display values outside the bars and set bar color
 
     bar_fig.update_layout(
-        title={'text': f"<b>{division_name}</b>", 'font': {'size': 14, 'color': 'black'}, 'x': 0, 'xanchor': 'left'},
+        title={'text': f"<b>{' › '.join(map(str, path))}</b>", 'font': {'size': 14, 'color': 'black'}, 'x': 0, 'xanchor': 'left'},
         xaxis_title=None,
         yaxis_title=None,
         xaxis=dict(
@@ -114,21 +374,22 @@ def update_bar_chart(division_name):
         height=fig_height  # Set the height of the figure
     )
 
-    col_bar_chart.plotly_chart(bar_fig, use_container_width=True, key=f"bar_chart_{division_name}")
+    payload.compact('drilldown', bar_fig)
+    st.plotly_chart(bar_fig, use_container_width=True, key=f"bar_chart_{'_'.join(map(str, path))}")
 
 # Main layout: Divide the main area into a sidebar for filters and a main content area for displaying charts
 main_content = st.columns([1, 11])  # Sidebar width fixed to 1, main content uses remaining space
 
 with main_content[1]:
     # Tabs for Performance by Division and Performance by Feature 1
-    tab1, tab2 = st.tabs([f"Performance by {division_col}", f"Performance by {division_col} Version 2"])
+    tab1, tab2, tab3, tab4 = st.tabs([f"Performance by {division_col}", f"Performance by {division_col} Version 2", "Compare segments", "Metric grid"])
 
     with tab1:
         # Filters with separate expanders
         col1, col2, col3, col4 = st.columns([3, 3, 3, 3])
         with col1:
             with st.expander("Period"):
-                selected_period = st.multiselect(f"Select {data.columns[period_col]}:", data.iloc[:, period_col].unique(), default=data.iloc[:, period_col].unique(), key="division_period")
+                selected_period = st.multiselect(f"Select {data.columns[period_col]}:", dataset.values[period_col], default=dataset.values[period_col], key="division_period")
 
         with col2:
             with st.expander("Metrics"):
@@ -136,11 +397,11 @@ with main_content[1]:
 
         with col3:
             with st.expander(f"{data.columns[feature_2_col]}"):
-                selected_feature_2 = st.multiselect(f"Select {data.columns[feature_2_col]}:", data.iloc[:, feature_2_col].unique(), default=data.iloc[:, feature_2_col].unique(), key="division_feature_2")
+                selected_feature_2 = st.multiselect(f"Select {data.columns[feature_2_col]}:", dataset.values[feature_2_col], default=dataset.values[feature_2_col], key="division_feature_2")
 
         with col4:
             with st.expander(f"{data.columns[feature_1_col]}"):
-                selected_feature_1 = st.multiselect(f"Select {data.columns[feature_1_col]}:", data.iloc[:, feature_1_col].unique(), default=data.iloc[:, feature_1_col].unique(), key="division_feature_1")
+                selected_feature_1 = st.multiselect(f"Select {data.columns[feature_1_col]}:", dataset.values[feature_1_col], default=dataset.values[feature_1_col], key="division_feature_1")
 
         # Determine column widths based on the type of metric
         if selected_metric in data.columns[single_select_cols] or selected_metric in data.columns[multi_select_cols]:
@@ -149,417 +410,46 @@ with main_content[1]:
             col_chart, col_bar_chart = st.columns([7, 5])
 
         with col_chart:
-            # Ensure all filters are properly referenced here
-            filtered_data = data[
-                (data.iloc[:, period_col].isin(selected_period)) &
-                (data.iloc[:, feature_2_col].isin(selected_feature_2)) &
-                (data.iloc[:, feature_1_col].isin(selected_feature_1))
-            ]
-
             # Calculate the average of the selected metric for boolean and numeric columns
             if selected_metric in data.columns[boolean_cols] or selected_metric in data.columns[numeric_cols]:
-                average_metrics = filtered_data.groupby([division_col, data.columns[period_col]])[selected_metric].agg(['mean', 'count']).reset_index()
-                average_metrics = average_metrics.sort_values(by='mean', ascending=False)
-                overall_avg = filtered_data.groupby(data.columns[period_col])[selected_metric].mean().reset_index()
+                refinement = None
+                if preview_mode and not is_unfiltered(selected_period, selected_feature_2, selected_feature_1):
+                    refinement = get_refinement(selected_period, selected_feature_2, selected_feature_1, division_col)
+                if refinement is not None and not refinement.done():
+                    # Show the chart of a stratified sample, a later rerun swaps in the exact result once it is ready
+                    sample_intervals, sampled_rows, total_rows = get_sample_intervals(selected_period, selected_feature_2, selected_feature_1, division_col)
+                    preview_metrics, preview_avg = division_scores(sample_intervals, division_col, data.columns[period_col], selected_metric)
+                    preview_fig = build_score_chart(preview_metrics, preview_avg, division_col, data.columns[period_col], selected_metric,
+                                                    boolean=selected_metric in data.columns[boolean_cols])
+                    preview_fig.update_layout(title_text=f"<b>{selected_metric}</b> (approximate)")
+                    payload.compact('score preview', preview_fig)
+                    st.caption(f"Approximate result from a sample of {sampled_rows:,} of {total_rows:,} responses, refining...")
+                    st.plotly_chart(preview_fig, use_container_width=True, key='scatter_preview')
+                    wait_for_refinement(refinement)
+                    average_metrics = None
+                else:
+                    intervals = get_intervals(selected_period, selected_feature_2, selected_feature_1, division_col)  # Cached by the refinement
+                    average_metrics, overall_avg = division_scores(intervals, division_col, data.columns[period_col], selected_metric)
             # Count occurrences for single select and multi select columns
             elif selected_metric in data.columns[single_select_cols] or selected_metric in data.columns[multi_select_cols]:
-                average_metrics = filtered_data.groupby([division_col, data.columns[period_col], selected_metric]).size().reset_index(name='count')
-                average_metrics = average_metrics.sort_values(by='count', ascending=False)
-                overall_avg = None  
+                average_metrics = get_option_counts(selected_period, selected_feature_2, selected_feature_1, division_col, selected_metric)
+                overall_avg = None
 
-            # Create the scatter plot with Plotly
-            if selected_metric in data.columns[boolean_cols]:
-                # Handle boolean metrics
-                fig = px.scatter(average_metrics, x=division_col, y='mean',
-                                color=data.columns[period_col],
-                                hover_name=division_col,
-                                hover_data={'mean': ':.2%', 'count': True},
-                                labels={'mean': 'Average score (%)', 'count': 'Number of responses'},
-                                color_discrete_sequence=['#0C275C', '#6398DF'])
-                fig.update_layout(
-                    yaxis=dict(
-                        tickformat=".0%",  # Set y-axis to percentage format
-                        range=[0, 1.1],  # Set y-axis range from 0% to 110%
-                        showticklabels=True,
-                        showgrid=True,  # Show horizontal gridlines
-                        zeroline=False
-                    ),
-                    title={'text': f"<b>{selected_metric}</b>", 'font': {'size': 12, 'color': 'black'}, 'x': 0, 'xanchor': 'left'},
-                    xaxis_showticklabels=False,
-                    xaxis=dict(
-                        showticklabels=False, 
-                        showgrid=False,  # Remove vertical gridlines
-                        zeroline=False
-                    ),
-                    xaxis_title=None,
-                    yaxis_title=None,
-                    legend=dict(
-                        x=1, y=1,
-                        xanchor='right', yanchor='top'
-                    ),
-                    legend_title_text='',
-                    margin=dict(l=30, r=5, t=25, b=5)
-                )
-            
-            elif selected_metric in data.columns[single_select_cols]:
-                # Calculate the percentage of each count relative to the total count for each Programme and Year
-                total_counts = average_metrics.groupby([division_col, data.columns[period_col]])['count'].transform('sum')
-                average_metrics['percentage'] = average_metrics['count'] / total_counts * 100
-
-                # Sort data to ensure consistency in bar placement
-                average_metrics.sort_values(by=[division_col, data.columns[period_col], selected_metric], inplace=True)
-
-                # Define a list of colors to be used for the metrics
-                color_list = [
-                    "#1C4A86", "#DD1C1F", "#3ABE72",
-                    "#581845", "#FFC300", "#DAF7A6", 
-                    "#FF5733", "#C70039", "#900C3F",  
-                    "#FF33FF", "#33FF57", "#5733FF", 
-                    "#33FFF5", "#FF3380", "#80FF33"
-                ]
-
-                # Get unique metrics and create a color map
-                unique_metrics = average_metrics[selected_metric].unique()
-                color_map = {metric: color_list[i % len(color_list)] for i, metric in enumerate(unique_metrics)}
-
-                # Slice the color list to match the number of unique metrics
-                color_list = color_list[:len(unique_metrics)]
-
-                # Assign color or opacity based on the period
-                period_col_name = data.columns[period_col]
-                unique_periods = average_metrics[period_col_name].unique()
-
-                # Create a new column that combines Programme and Year for grouping
-                average_metrics['Programme_Year'] = average_metrics[division_col] + ' (' + average_metrics[period_col_name].astype(str) + ')'
-                # Sort the y-axis labels alphabetically
-                average_metrics.sort_values(by=division_col, inplace=True, ascending=False)
-
-                # Calculate the overall distribution for comparison
-                overall_avg = average_metrics.groupby([data.columns[period_col], selected_metric]).agg({
-                    'count': 'sum'
-                }).reset_index()
-                overall_total_counts = overall_avg.groupby(data.columns[period_col])['count'].transform('sum')
-                overall_avg['percentage'] = overall_avg['count'] / overall_total_counts * 100
-                overall_avg[division_col] = 'Overall Average'
-                overall_avg['Programme_Year'] = 'Overall Average (' + overall_avg[period_col_name].astype(str) + ')'
-
-                # Sort selected_metric column based on the order of unique metrics for each value in division_col
-                average_metrics[selected_metric] = pd.Categorical(average_metrics[selected_metric], categories=unique_metrics, ordered=True)
-                average_metrics.sort_values(by=[division_col, selected_metric], inplace=True)
-
-                # Prepend the overall average row to the average_metrics DataFrame
-                average_metrics = pd.concat([overall_avg, average_metrics], ignore_index=True)
-
-                # Define the desired bar height and number of visible bars
-                bar_height = 20  # Height of each bar
-                fig_height = 450  # Total height of the visible area
-
-                # Create separate traces for each period
-                traces = []
-                for i, period in enumerate(unique_periods):
-                    period_data = average_metrics[average_metrics[period_col_name] == period]
-                    trace = go.Bar(
-                        x=period_data['percentage'],
-                        y=period_data[division_col],
-                        name=f'{period}',
-                        orientation='h',
-                        text=period_data['percentage'].apply(lambda x: f'{x:.1f}%'),  # Add labels on the bars
-                        textposition='inside',  # Position the text inside the bars
-                        marker=dict(
-                        color=[color_map[val] for val in period_data[selected_metric]],  # Apply colors based on the color_map
-                            pattern=dict(
-                                shape="/" if i == 1 else "",  # Add diagonal stripes for the second unique period
-                                size=2 
-                            )
-                        ),
-                        width=0.4  # Adjust the bar thickness here
-                    )
-                    traces.append(trace)
-
-                # Create the figure with the traces
-                fig = go.Figure(data=traces)
+            if selected_metric in data.columns[single_select_cols] or selected_metric in data.columns[multi_select_cols]:
+                # Build the stacked bar chart from the option count matrix
+                figure_key = ('select', top_k_options, selected_metric) + filter_key(selected_period, selected_feature_2, selected_feature_1, division_col)
+                fig = cached_figure(figure_key, lambda: build_select_chart(average_metrics, division_col, data.columns[period_col], selected_metric, top_k_options),
+                                   decimals=PERCENT_DECIMALS)
 
-                # Add annotation at the bottom of the chart
-                fig.add_annotation(
-                    text="Current period is in solid colors, previous period transparent",
-                    xref="paper", yref="paper",
-                    x=0.6, y=-0.05,
-                    showarrow=False,
-                    font=dict(size=12),
-                    xanchor='center', yanchor='top'
-                )
-            
-                # Custom legend - annotations and shapes
-                legend_x = 1  # x position for legend boxes outside the plot area
-                legend_y_start = 1  # Starting y position for the first legend item
-                box_width = 0.03  # Width of the legend box
-                box_height = 0.03  # Height of the legend box
-                text_offset_y = 0.015  # Vertical offset for the text to align with the box
-            
-                for i, (metric, color) in enumerate(color_map.items()):
-                    # Calculate y position for each item
-                    current_y = legend_y_start - i * 0.04  # Stack items vertically with a gap
-            
-                    # Adding legend boxes
-                    fig.add_shape(
-                        type="rect",
-                        x0=legend_x,
-                        x1=legend_x + box_width,
-                        y0=current_y,
-                        y1=current_y + box_height,
-                        line=dict(color=color),
-                        fillcolor=color,
-                        xref='paper',  # Reference to the entire figure's width
-                        yref='paper'  # Reference to the entire figure's height
-                    )
-                    # Adding text next to the boxes
-                    fig.add_annotation(
-                        x=legend_x + box_width + 0.01,  # Place text right outside the box
-                        y=current_y + box_height / 2,  # Vertically center text in the box
-                        text=metric,
-                        showarrow=False,
-                        xanchor='left',
-                        yanchor='middle',
-                        xref='paper',  # Keep annotations tied to the paper regardless of graph changes
-                        yref='paper'
-                    )
-            
-                fig.update_layout(
-                    height=fig_height,  # Set the dynamic height based on the number of visible bars
-                    width=700,
-                    showlegend=False,
-                    title={'text': f"<b>{selected_metric}</b>", 'font': {'size': 12, 'color': 'black'}, 'x': 0, 'xanchor': 'left'},
-                    xaxis_showticklabels=False,
-                    xaxis=dict(
-                        showticklabels=True, 
-                        showgrid=False,  # Remove vertical gridlines
-                        zeroline=False,
-                        range=[0, 110],
-                        tickfont=dict(size=14, color='black')  # Increase the size of y-axis labels
-                    ),
-                    xaxis_title=None,
-                    yaxis_title=None,
-                    yaxis=dict(
-                        showticklabels=True,  # Enable y-axis labels
-                        showgrid=True,  # Show horizontal gridlines
-                        zeroline=False,
-                        automargin=True,  # Automatically adjust margin to fit y-axis labels
-                        categoryorder='array',  # Set the category order to be defined by the array
-                        categoryarray=average_metrics[division_col].unique(),  # Use the sorted division_col values
-                        tickfont=dict(size=14, color='black')  # Increase the size of y-axis labels
-                    ),
-                    margin=dict(l=30, r=70, t=25, b=15)
-                )
-            
                 # Display the chart within a container with vertical scrolling
-                st.plotly_chart(fig, use_container_width=True, key='single_select_chart_1')
-
-            elif selected_metric in data.columns[multi_select_cols]:
-                # Split the multi-select column by '|' and explode the DataFrame
-                average_metrics[selected_metric] = average_metrics[selected_metric].str.split('|')
-                average_metrics = average_metrics.explode(selected_metric)
-
-                # Strip any leading or trailing whitespace from the split values
-                average_metrics[selected_metric] = average_metrics[selected_metric].str.strip()
-
-                # Group by division_col, period_col, and selected_metric to calculate the count
-                average_metrics = average_metrics.groupby([division_col, data.columns[period_col], selected_metric]).size().reset_index(name='count')
-
-                # Calculate the percentage of each count relative to the total count for each Programme and Year
-                total_counts = average_metrics.groupby([division_col, data.columns[period_col]])['count'].transform('sum')
-                average_metrics['percentage'] = average_metrics['count'] / total_counts * 100
-
-                # Sort data to ensure consistency in bar placement
-                average_metrics.sort_values(by=[division_col, data.columns[period_col], selected_metric], inplace=True)
-
-                # Define a list of colors to be used for the metrics
-                color_list = [
-                    "#1C4A86", "#DD1C1F", "#3ABE72",
-                    "#581845", "#FFC300", "#DAF7A6", 
-                    "#FF5733", "#C70039", "#900C3F",  
-                    "#FF33FF", "#33FF57", "#5733FF", 
-                    "#33FFF5", "#FF3380", "#80FF33"
-                ]
-
-                # Get unique metrics and create a color map
-                unique_metrics = average_metrics[selected_metric].unique()
-                color_map = {metric: color_list[i % len(color_list)] for i, metric in enumerate(unique_metrics)}
-
-                # Slice the color list to match the number of unique metrics
-                color_list = color_list[:len(unique_metrics)]
-
-                # Assign color or opacity based on the period
-                period_col_name = data.columns[period_col]
-                unique_periods = average_metrics[period_col_name].unique()
-
-                # Create a new column that combines Programme and Year for grouping
-                average_metrics['Programme_Year'] = average_metrics[division_col] + ' (' + average_metrics[period_col_name].astype(str) + ')'
-                # Sort the y-axis labels alphabetically
-                average_metrics.sort_values(by=division_col, inplace=True, ascending=False)
-
-                # Calculate the overall distribution for comparison
-                overall_avg = average_metrics.groupby([data.columns[period_col], selected_metric]).agg({
-                    'count': 'sum'
-                }).reset_index()
-                overall_total_counts = overall_avg.groupby(data.columns[period_col])['count'].transform('sum')
-                overall_avg['percentage'] = overall_avg['count'] / overall_total_counts * 100
-                overall_avg[division_col] = 'Overall Average'
-                overall_avg['Programme_Year'] = 'Overall Average (' + overall_avg[period_col_name].astype(str) + ')'
-
-                # Sort selected_metric column based on the order of unique metrics for each value in division_col
-                average_metrics[selected_metric] = pd.Categorical(average_metrics[selected_metric], categories=unique_metrics, ordered=True)
-                average_metrics.sort_values(by=[division_col, selected_metric], inplace=True)
-
-                # Prepend the overall average row to the average_metrics DataFrame
-                average_metrics = pd.concat([overall_avg, average_metrics], ignore_index=True)
-
-                # Define the desired bar height and number of visible bars
-                bar_height = 20  # Height of each bar
-                fig_height = 450  # Total height of the visible area
-
-                # Create separate traces for each period
-                traces = []
-                for i, period in enumerate(unique_periods):
-                    period_data = average_metrics[average_metrics[period_col_name] == period]
-                    trace = go.Bar(
-                        x=period_data['percentage'],
-                        y=period_data[division_col],
-                        name=f'{period}',
-                        orientation='h',
-                        text=period_data['percentage'].apply(lambda x: f'{x:.1f}%'),  # Add labels on the bars
-                        textposition='inside',  # Position the text inside the bars
-                        marker=dict(
-                        color=[color_map[val] for val in period_data[selected_metric]],  # Apply colors based on the color_map
-                            pattern=dict(
-                                shape="/" if i == 1 else "",  # Add diagonal stripes for the second unique period
-                                size=2 
-                            )
-                        ),
-                        width=0.4  # Adjust the bar thickness here
-                    )
-                    traces.append(trace)
+                st.plotly_chart(fig, use_container_width=True, key='select_chart_1')
 
-                # Create the figure with the traces
-                fig = go.Figure(data=traces)
+            # Create the scatter plot with Plotly (only for boolean and numeric metrics, once their exact result is known)
+            if (selected_metric in data.columns[boolean_cols] or selected_metric in data.columns[numeric_cols]) and average_metrics is not None:
+                figure_key = ('score', selected_metric) + filter_key(selected_period, selected_feature_2, selected_feature_1, division_col)
+                fig = cached_figure(figure_key, lambda: build_score_chart(average_metrics, overall_avg, division_col, data.columns[period_col], selected_metric,
+                                                                          boolean=selected_metric in data.columns[boolean_cols]))
 
-                # Add annotation at the bottom of the chart
-                fig.add_annotation(
-                    text="Current period is in solid colors, previous period transparent",
-                    xref="paper", yref="paper",
-                    x=0.6, y=-0.05,
-                    showarrow=False,
-                    font=dict(size=12),
-                    xanchor='center', yanchor='top'
-                )
-            
-                # Custom legend - annotations and shapes
-                legend_x = 1  # x position for legend boxes outside the plot area
-                legend_y_start = 1  # Starting y position for the first legend item
-                box_width = 0.03  # Width of the legend box
-                box_height = 0.03  # Height of the legend box
-                text_offset_y = 0.015  # Vertical offset for the text to align with the box
-            
-                for i, (metric, color) in enumerate(color_map.items()):
-                    # Calculate y position for each item
-                    current_y = legend_y_start - i * 0.04  # Stack items vertically with a gap
-            
-                    # Adding legend boxes
-                    fig.add_shape(
-                        type="rect",
-                        x0=legend_x,
-                        x1=legend_x + box_width,
-                        y0=current_y,
-                        y1=current_y + box_height,
-                        line=dict(color=color),
-                        fillcolor=color,
-                        xref='paper',  # Reference to the entire figure's width
-                        yref='paper'  # Reference to the entire figure's height
-                    )
-                    # Adding text next to the boxes
-                    fig.add_annotation(
-                        x=legend_x + box_width + 0.01,  # Place text right outside the box
-                        y=current_y + box_height / 2,  # Vertically center text in the box
-                        text=metric,
-                        showarrow=False,
-                        xanchor='left',
-                        yanchor='middle',
-                        xref='paper',  # Keep annotations tied to the paper regardless of graph changes
-                        yref='paper'
-                    )
-            
-                fig.update_layout(
-                    height=fig_height,  # Set the dynamic height based on the number of visible bars
-                    width=700,
-                    showlegend=False,
-                    title={'text': f"<b>{selected_metric}</b>", 'font': {'size': 12, 'color': 'black'}, 'x': 0, 'xanchor': 'left'},
-                    xaxis_showticklabels=False,
-                    xaxis=dict(
-                        showticklabels=True, 
-                        showgrid=False,  # Remove vertical gridlines
-                        zeroline=False,
-                        range=[0, 110],
-                        tickfont=dict(size=14, color='black')  # Increase the size of y-axis labels
-                    ),
-                    xaxis_title=None,
-                    yaxis_title=None,
-                    yaxis=dict(
-                        showticklabels=True,  # Enable y-axis labels
-                        showgrid=True,  # Show horizontal gridlines
-                        zeroline=False,
-                        automargin=True,  # Automatically adjust margin to fit y-axis labels
-                        categoryorder='array',  # Set the category order to be defined by the array
-                        categoryarray=average_metrics[division_col].unique(),  # Use the sorted division_col values
-                        tickfont=dict(size=14, color='black')  # Increase the size of y-axis labels
-                    ),
-                    margin=dict(l=30, r=70, t=25, b=15)
-                )
-            
-                # Display the chart within a container with vertical scrolling
-                st.plotly_chart(fig, use_container_width=True, key='multi_select_chart_1')
-
-            else:
-                # Handle numeric metrics
-                fig = px.scatter(average_metrics, x=division_col, y='mean',
-                                color=data.columns[period_col],
-                                hover_name=division_col,
-                                hover_data={'mean': ':.2f', 'count': True},
-                                labels={'mean': 'Average score', 'count': 'Number of responses'},
-                                color_discrete_sequence=['#0C275C', '#6398DF'])
-                fig.update_layout(
-                    title={'text': f"<b>{selected_metric}</b>", 'font': {'size': 12, 'color': 'black'}, 'x': 0, 'xanchor': 'left'},
-                    xaxis_showticklabels=False,
-                    xaxis=dict(
-                        showticklabels=False, 
-                        showgrid=False,  # Remove vertical gridlines
-                        zeroline=False
-                    ),
-                    xaxis_title=None,
-                    yaxis_title=None,
-                    yaxis=dict(
-                        showticklabels=True,
-                        showgrid=True,  # Show horizontal gridlines
-                        zeroline=False,
-                        range=[0, average_metrics['mean'].max() + 1]  # Set the range of the y-axis
-                    ),
-                    legend=dict(
-                        x=1, y=1,
-                        xanchor='right', yanchor='top'
-                    ),
-                    legend_title_text='',
-                    margin=dict(l=15, r=5, t=25, b=5)
-                )
-            
-            # Add horizontal lines for the overall average score for each period (only for boolean and numeric metrics)
-            if selected_metric in data.columns[boolean_cols] or selected_metric in data.columns[numeric_cols]:
-                for period, color in zip(overall_avg[data.columns[period_col]], ['#0C275C', '#6398DF']):
-                    avg_score = overall_avg[overall_avg[data.columns[period_col]] == period][selected_metric].values[0]
-                    fig.add_hline(y=avg_score, line_color=color, line_width=2,
-                                  annotation_text=f"Avg: {avg_score:.1f}",  # Text indicating the average
-                                  annotation_position="top right",  # Positioning it at the top right
-                                  annotation_font_size=10,  # Setting the font size
-                                  annotation_font_color=color,  # Making the font color the same as the line color
-                                  annotation_showarrow=False)  # Not showing any arrow pointing to the line
-            
                 # Add a note in the bottom left area of the scatter chart
                 fig.add_annotation(
                     text="Please click on the division to see the detailed performance",
@@ -583,11 +473,8 @@ with main_content[1]:
                             if selected_division_name in data[division_col].values:
                                
                                 # Show the selected data
-                                division_data = data[data[division_col] == selected_division_name]
-                                
-                                # Filter to include only boolean and numeric columns
-                                division_data = division_data[data.columns[boolean_cols + numeric_cols]]
-                                update_bar_chart(selected_division_name)  # Update the bar chart with the selected division
+                                drill_down(selected_division_name, selected_metric, key='scatter',  # Show the selected division and its feature breakdowns
+                                           selections={period_col: selected_period, feature_2_col: selected_feature_2, feature_1_col: selected_feature_1})
                     except IndexError as e:
                         pass
                     except Exception as e:
@@ -598,7 +485,7 @@ with main_content[1]:
         col1, col2, col3, col4 = st.columns([3, 3, 3, 3])
         with col1:
             with st.expander("Period"):
-                selected_period = st.multiselect(f"Select {data.columns[period_col]}:", data.iloc[:, period_col].unique(), default=data.iloc[:, period_col].unique(), key="feature1_period")
+                selected_period = st.multiselect(f"Select {data.columns[period_col]}:", dataset.values[period_col], default=dataset.values[period_col], key="feature1_period")
 
         with col2:
             with st.expander("Metrics"):
@@ -606,11 +493,11 @@ with main_content[1]:
 
         with col3:
             with st.expander(f"{data.columns[feature_2_col]}"):
-                selected_feature_2 = st.multiselect(f"Select {data.columns[feature_2_col]}:", data.iloc[:, feature_2_col].unique(), default=data.iloc[:, feature_2_col].unique(), key="feature1_feature_2")
+                selected_feature_2 = st.multiselect(f"Select {data.columns[feature_2_col]}:", dataset.values[feature_2_col], default=dataset.values[feature_2_col], key="feature1_feature_2")
 
         with col4:
             with st.expander(f"{data.columns[feature_1_col]}"):
-                selected_feature_1 = st.multiselect(f"Select {data.columns[feature_1_col]}:", data.iloc[:, feature_1_col].unique(), default=data.iloc[:, feature_1_col].unique(), key="feature1_feature_1")
+                selected_feature_1 = st.multiselect(f"Select {data.columns[feature_1_col]}:", dataset.values[feature_1_col], default=dataset.values[feature_1_col], key="feature1_feature_1")
 
         # Determine column widths based on the type of metric
         if selected_metric in data.columns[single_select_cols] or selected_metric in data.columns[multi_select_cols]:
@@ -620,11 +507,7 @@ with main_content[1]:
 
         with col_chart:
             # Ensure all filters are properly referenced here
-            filtered_data = data[
-                (data.iloc[:, period_col].isin(selected_period)) &
-                (data.iloc[:, feature_2_col].isin(selected_feature_2)) &
-                (data.iloc[:, feature_1_col].isin(selected_feature_1))
-            ]
+            filtered_data = filter_data(selected_period, selected_feature_2, selected_feature_1)
 
             # Calculate the average of the selected metric for boolean and numeric columns
             if selected_metric in data.columns[boolean_cols] or selected_metric in data.columns[numeric_cols]:
@@ -633,13 +516,13 @@ with main_content[1]:
                 overall_avg = filtered_data.groupby(data.columns[period_col])[selected_metric].mean().reset_index()
             # Count occurrences for single select and multi select columns
             elif selected_metric in data.columns[single_select_cols] or selected_metric in data.columns[multi_select_cols]:
-                average_metrics = filtered_data.groupby([division_col, data.columns[period_col], selected_metric]).size().reset_index(name='count')
-                average_metrics = average_metrics.sort_values(by='count', ascending=False)
-                overall_avg = None  
+                average_metrics = get_option_counts(selected_period, selected_feature_2, selected_feature_1, division_col, selected_metric)
+                overall_avg = None
 
             # Create the scatter plot with Plotly
             if selected_metric in data.columns[boolean_cols]:
                 # Handle boolean metrics
+                import plotly.express as px  # Deferred until a bar chart of Yes/No or numeric metric is shown
                 fig = px.bar(average_metrics, x='mean', y=division_col,
                             color=data.columns[period_col],
                             orientation='h',
@@ -708,6 +591,7 @@ with main_content[1]:
                 )
 
                 # Capture selected points from the bar chart using plotly_events
+                payload.compact('bar', fig)
                 selected_points = plotly_events(fig, key="feature1_bar_events")
                 
                 # Update the bar chart if a point is selected
@@ -717,11 +601,8 @@ with main_content[1]:
                         
                         # Check if the selected division name exists in the data
                         if selected_division_name in data[division_col].values:
-                            division_data = data[data[division_col] == selected_division_name]
-                                
-                            # Filter to include only boolean and numeric columns
-                            division_data = division_data[data.columns[boolean_cols + numeric_cols]]
-                            update_bar_chart(selected_division_name)  # Update the bar chart with the selected division
+                            drill_down(selected_division_name, selected_metric, key='feature1_bar_events',  # Show the selected division and its feature breakdowns
+                                       selections={period_col: selected_period, feature_2_col: selected_feature_2, feature_1_col: selected_feature_1})
                         else:
                             st.write("Selected division name not found in the data.")
                     except IndexError as e:
@@ -731,323 +612,17 @@ with main_content[1]:
                 else:
                     pass
             
-            elif selected_metric in data.columns[single_select_cols]:
-                # Calculate the percentage of each count relative to the total count for each Programme and Year
-                total_counts = average_metrics.groupby([division_col, data.columns[period_col]])['count'].transform('sum')
-                average_metrics['percentage'] = average_metrics['count'] / total_counts * 100
-
-                # Sort data to ensure consistency in bar placement
-                average_metrics.sort_values(by=[division_col, data.columns[period_col], selected_metric], inplace=True)
-
-                # Define a list of colors to be used for the metrics
-                color_list = [
-                    "#1C4A86", "#DD1C1F", "#3ABE72",
-                    "#581845", "#FFC300", "#DAF7A6", 
-                    "#FF5733", "#C70039", "#900C3F",  
-                    "#FF33FF", "#33FF57", "#5733FF", 
-                    "#33FFF5", "#FF3380", "#80FF33"
-                ]
-
-                # Get unique metrics and create a color map
-                unique_metrics = average_metrics[selected_metric].unique()
-                color_map = {metric: color_list[i % len(color_list)] for i, metric in enumerate(unique_metrics)}
-
-                # Slice the color list to match the number of unique metrics
-                color_list = color_list[:len(unique_metrics)]
-
-                # Assign color or opacity based on the period
-                period_col_name = data.columns[period_col]
-                unique_periods = average_metrics[period_col_name].unique()
-
-                # Create a new column that combines Programme and Year for grouping
-                average_metrics['Programme_Year'] = average_metrics[division_col] + ' (' + average_metrics[period_col_name].astype(str) + ')'
-                # Sort the y-axis labels alphabetically
-                average_metrics.sort_values(by=division_col, inplace=True, ascending=False)
-
-                # Calculate the overall distribution for comparison
-                overall_avg = average_metrics.groupby([data.columns[period_col], selected_metric]).agg({
-                    'count': 'sum'
-                }).reset_index()
-                overall_total_counts = overall_avg.groupby(data.columns[period_col])['count'].transform('sum')
-                overall_avg['percentage'] = overall_avg['count'] / overall_total_counts * 100
-                overall_avg[division_col] = 'Overall Average'
-                overall_avg['Programme_Year'] = 'Overall Average (' + overall_avg[period_col_name].astype(str) + ')'
-
-                # Sort selected_metric column based on the order of unique metrics for each value in division_col
-                average_metrics[selected_metric] = pd.Categorical(average_metrics[selected_metric], categories=unique_metrics, ordered=True)
-                average_metrics.sort_values(by=[division_col, selected_metric], inplace=True)
-
-                # Prepend the overall average row to the average_metrics DataFrame
-                average_metrics = pd.concat([overall_avg, average_metrics], ignore_index=True)
-
-                # Define the desired bar height and number of visible bars
-                bar_height = 20  # Height of each bar
-                fig_height = 450  # Total height of the visible area
-
-                # Create separate traces for each period
-                traces = []
-                for i, period in enumerate(unique_periods):
-                    period_data = average_metrics[average_metrics[period_col_name] == period]
-                    trace = go.Bar(
-                        x=period_data['percentage'],
-                        y=period_data[division_col],
-                        name=f'{period}',
-                        orientation='h',
-                        text=period_data['percentage'].apply(lambda x: f'{x:.1f}%'),  # Add labels on the bars
-                        textposition='inside',  # Position the text inside the bars
-                        marker=dict(
-                        color=[color_map[val] for val in period_data[selected_metric]],  # Apply colors based on the color_map
-                            pattern=dict(
-                                shape="/" if i == 1 else "",  # Add diagonal stripes for the second unique period
-                                size=2 
-                            )
-                        ),
-                        width=0.4  # Adjust the bar thickness here
-                    )
-                    traces.append(trace)
-
-                # Create the figure with the traces
-                fig = go.Figure(data=traces)
+            elif selected_metric in data.columns[single_select_cols] or selected_metric in data.columns[multi_select_cols]:
+                # Build the stacked bar chart from the option count matrix
+                figure_key = ('select', top_k_options, selected_metric) + filter_key(selected_period, selected_feature_2, selected_feature_1, division_col)
+                fig = cached_figure(figure_key, lambda: build_select_chart(average_metrics, division_col, data.columns[period_col], selected_metric, top_k_options),
+                                   decimals=PERCENT_DECIMALS)
 
-                # Add annotation at the bottom of the chart
-                fig.add_annotation(
-                    text="Current period is in solid colors, previous period transparent",
-                    xref="paper", yref="paper",
-                    x=0.6, y=-0.05,
-                    showarrow=False,
-                    font=dict(size=12),
-                    xanchor='center', yanchor='top'
-                )
-            
-                # Custom legend - annotations and shapes
-                legend_x = 1  # x position for legend boxes outside the plot area
-                legend_y_start = 1  # Starting y position for the first legend item
-                box_width = 0.03  # Width of the legend box
-                box_height = 0.03  # Height of the legend box
-                text_offset_y = 0.015  # Vertical offset for the text to align with the box
-            
-                for i, (metric, color) in enumerate(color_map.items()):
-                    # Calculate y position for each item
-                    current_y = legend_y_start - i * 0.04  # Stack items vertically with a gap
-            
-                    # Adding legend boxes
-                    fig.add_shape(
-                        type="rect",
-                        x0=legend_x,
-                        x1=legend_x + box_width,
-                        y0=current_y,
-                        y1=current_y + box_height,
-                        line=dict(color=color),
-                        fillcolor=color,
-                        xref='paper',  # Reference to the entire figure's width
-                        yref='paper'  # Reference to the entire figure's height
-                    )
-                    # Adding text next to the boxes
-                    fig.add_annotation(
-                        x=legend_x + box_width + 0.01,  # Place text right outside the box
-                        y=current_y + box_height / 2,  # Vertically center text in the box
-                        text=metric,
-                        showarrow=False,
-                        xanchor='left',
-                        yanchor='middle',
-                        xref='paper',  # Keep annotations tied to the paper regardless of graph changes
-                        yref='paper'
-                    )
-            
-                fig.update_layout(
-                    height=fig_height,  # Set the dynamic height based on the number of visible bars
-                    width=700,
-                    showlegend=False,
-                    title={'text': f"<b>{selected_metric}</b>", 'font': {'size': 12, 'color': 'black'}, 'x': 0, 'xanchor': 'left'},
-                    xaxis_showticklabels=False,
-                    xaxis=dict(
-                        showticklabels=True, 
-                        showgrid=False,  # Remove vertical gridlines
-                        zeroline=False,
-                        range=[0, 110],
-                        tickfont=dict(size=14, color='black')  # Increase the size of y-axis labels
-                    ),
-                    xaxis_title=None,
-                    yaxis_title=None,
-                    yaxis=dict(
-                        showticklabels=True,  # Enable y-axis labels
-                        showgrid=True,  # Show horizontal gridlines
-                        zeroline=False,
-                        automargin=True,  # Automatically adjust margin to fit y-axis labels
-                        categoryorder='array',  # Set the category order to be defined by the array
-                        categoryarray=average_metrics[division_col].unique(),  # Use the sorted division_col values
-                        tickfont=dict(size=14, color='black')  # Increase the size of y-axis labels
-                    ),
-                    margin=dict(l=30, r=70, t=25, b=15)
-                )
-            
                 # Display the chart within a container with vertical scrolling
-                st.plotly_chart(fig, use_container_width=True, key='single_select_chart_2')
-
-            elif selected_metric in data.columns[multi_select_cols]:
-                # Split the multi-select column by '|' and explode the DataFrame
-                average_metrics[selected_metric] = average_metrics[selected_metric].str.split('|')
-                average_metrics = average_metrics.explode(selected_metric)
-            
-                # Strip any leading or trailing whitespace from the split values
-                average_metrics[selected_metric] = average_metrics[selected_metric].str.strip()
-            
-                # Group by division_col, period_col, and selected_metric to calculate the count
-                average_metrics = average_metrics.groupby([division_col, data.columns[period_col], selected_metric]).size().reset_index(name='count')
-            
-                # Calculate the percentage of each count relative to the total count for each Programme and Year
-                total_counts = average_metrics.groupby([division_col, data.columns[period_col]])['count'].transform('sum')
-                average_metrics['percentage'] = average_metrics['count'] / total_counts * 100
-            
-                # Sort data to ensure consistency in bar placement
-                average_metrics.sort_values(by=[division_col, data.columns[period_col], selected_metric], inplace=True)
-            
-                # Define a list of colors to be used for the metrics
-                color_list = [
-                    "#1C4A86", "#DD1C1F", "#3ABE72",
-                    "#581845", "#FFC300", "#DAF7A6", 
-                    "#FF5733", "#C70039", "#900C3F",  
-                    "#FF33FF", "#33FF57", "#5733FF", 
-                    "#33FFF5", "#FF3380", "#80FF33"
-                ]
-
-                # Get unique metrics and create a color map
-                unique_metrics = average_metrics[selected_metric].unique()
-                color_map = {metric: color_list[i % len(color_list)] for i, metric in enumerate(unique_metrics)}
-
-                # Slice the color list to match the number of unique metrics
-                color_list = color_list[:len(unique_metrics)]
-
-                # Assign color or opacity based on the period
-                period_col_name = data.columns[period_col]
-                unique_periods = average_metrics[period_col_name].unique()
-
-                # Create a new column that combines Programme and Year for grouping
-                average_metrics['Programme_Year'] = average_metrics[division_col] + ' (' + average_metrics[period_col_name].astype(str) + ')'
-                # Sort the y-axis labels alphabetically
-                average_metrics.sort_values(by=division_col, inplace=True, ascending=False)
-
-                # Calculate the overall distribution for comparison
-                overall_avg = average_metrics.groupby([data.columns[period_col], selected_metric]).agg({
-                    'count': 'sum'
-                }).reset_index()
-                overall_total_counts = overall_avg.groupby(data.columns[period_col])['count'].transform('sum')
-                overall_avg['percentage'] = overall_avg['count'] / overall_total_counts * 100
-                overall_avg[division_col] = 'Overall Average'
-                overall_avg['Programme_Year'] = 'Overall Average (' + overall_avg[period_col_name].astype(str) + ')'
-
-                # Sort selected_metric column based on the order of unique metrics for each value in division_col
-                average_metrics[selected_metric] = pd.Categorical(average_metrics[selected_metric], categories=unique_metrics, ordered=True)
-                average_metrics.sort_values(by=[division_col, selected_metric], inplace=True)
-
-                # Prepend the overall average row to the average_metrics DataFrame
-                average_metrics = pd.concat([overall_avg, average_metrics], ignore_index=True)
-
-                # Define the desired bar height and number of visible bars
-                bar_height = 20  # Height of each bar
-                fig_height = 450  # Total height of the visible area
-
-                # Create separate traces for each period
-                traces = []
-                for i, period in enumerate(unique_periods):
-                    period_data = average_metrics[average_metrics[period_col_name] == period]
-                    trace = go.Bar(
-                        x=period_data['percentage'],
-                        y=period_data[division_col],
-                        name=f'{period}',
-                        orientation='h',
-                        text=period_data['percentage'].apply(lambda x: f'{x:.1f}%'),  # Add labels on the bars
-                        textposition='inside',  # Position the text inside the bars
-                        marker=dict(
-                        color=[color_map[val] for val in period_data[selected_metric]],  # Apply colors based on the color_map
-                            pattern=dict(
-                                shape="/" if i == 1 else "",  # Add diagonal stripes for the second unique period
-                                size=2 
-                            )
-                        ),
-                        width=0.4  # Adjust the bar thickness here
-                    )
-                    traces.append(trace)
-            
-                # Create the figure with the traces
-                fig = go.Figure(data=traces)
-            
-                # Add annotation at the bottom of the chart
-                fig.add_annotation(
-                    text="Current period is in solid colors, previous period transparent",
-                    xref="paper", yref="paper",
-                    x=0.6, y=-0.05,
-                    showarrow=False,
-                    font=dict(size=12),
-                    xanchor='center', yanchor='top'
-                )
-            
-                # Custom legend - annotations and shapes
-                legend_x = 1  # x position for legend boxes outside the plot area
-                legend_y_start = 1  # Starting y position for the first legend item
-                box_width = 0.03  # Width of the legend box
-                box_height = 0.03  # Height of the legend box
-                text_offset_y = 0.015  # Vertical offset for the text to align with the box
-            
-                for i, (metric, color) in enumerate(color_map.items()):
-                    # Calculate y position for each item
-                    current_y = legend_y_start - i * 0.04  # Stack items vertically with a gap
-            
-                    # Adding legend boxes
-                    fig.add_shape(
-                        type="rect",
-                        x0=legend_x,
-                        x1=legend_x + box_width,
-                        y0=current_y,
-                        y1=current_y + box_height,
-                        line=dict(color=color),
-                        fillcolor=color,
-                        xref='paper',  # Reference to the entire figure's width
-                        yref='paper'  # Reference to the entire figure's height
-                    )
-                    # Adding text next to the boxes
-                    fig.add_annotation(
-                        x=legend_x + box_width + 0.01,  # Place text right outside the box
-                        y=current_y + box_height / 2,  # Vertically center text in the box
-                        text=metric,
-                        showarrow=False,
-                        xanchor='left',
-                        yanchor='middle',
-                        xref='paper',  # Keep annotations tied to the paper regardless of graph changes
-                        yref='paper'
-                    )
-            
-                fig.update_layout(
-                    height=fig_height,  # Set the dynamic height based on the number of visible bars
-                    width=700,
-                    showlegend=False,
-                    title={'text': f"<b>{selected_metric}</b>", 'font': {'size': 12, 'color': 'black'}, 'x': 0, 'xanchor': 'left'},
-                    xaxis_showticklabels=False,
-                    xaxis=dict(
-                        showticklabels=True, 
-                        showgrid=False,  # Remove vertical gridlines
-                        zeroline=False,
-                        range=[0, 110],
-                        tickfont=dict(size=14, color='black')  # Increase the size of y-axis labels
-                    ),
-                    xaxis_title=None,
-                    yaxis_title=None,
-                    yaxis=dict(
-                        showticklabels=True,  # Enable y-axis labels
-                        showgrid=True,  # Show horizontal gridlines
-                        zeroline=False,
-                        automargin=True,  # Automatically adjust margin to fit y-axis labels
-                        categoryorder='array',  # Set the category order to be defined by the array
-                        categoryarray=average_metrics[division_col].unique(),  # Use the sorted division_col values
-                        tickfont=dict(size=14, color='black')  # Increase the size of y-axis labels
-                    ),
-                    margin=dict(l=30, r=70, t=25, b=15)
-                )
-            
-                # Display the chart within a container with vertical scrolling
-                st.plotly_chart(fig, use_container_width=True, key="multi_select_chart_2")
+                st.plotly_chart(fig, use_container_width=True, key='select_chart_2')
             
             else:
+                import plotly.express as px  # Deferred until a bar chart of Yes/No or numeric metric is shown
                 fig = px.bar(average_metrics, x='mean', y=division_col,
                              color=data.columns[period_col],
                              orientation='h',
@@ -1112,6 +687,7 @@ with main_content[1]:
                 )
             
                 # Capture selected points from the bar chart using plotly_events
+                payload.compact('bar', fig)
                 selected_points = plotly_events(fig, key="feature1_bar_events")
                 
                 # Update the bar chart if a point is selected
@@ -1121,11 +697,8 @@ with main_content[1]:
                         
                         # Check if the selected division name exists in the data
                         if selected_division_name in data[division_col].values:
-                            division_data = data[data[division_col] == selected_division_name]
-                                
-                            # Filter to include only boolean and numeric columns
-                            division_data = division_data[data.columns[boolean_cols + numeric_cols]]
-                            update_bar_chart(selected_division_name)  # Update the bar chart with the selected division
+                            drill_down(selected_division_name, selected_metric, key='feature1_select_events',  # Show the selected division and its feature breakdowns
+                                       selections={period_col: selected_period, feature_2_col: selected_feature_2, feature_1_col: selected_feature_1})
                         else:
                             st.write("Selected division name not found in the data.")
                     except IndexError as e:
@@ -1135,3 +708,147 @@ with main_content[1]:
                 else:
                     pass
 
+    with tab3:
+        # Filters of the metric and of the two segments
+        col1, col2, col3 = st.columns([3, 4, 4])
+        with col1:
+            with st.expander("Metrics"):
+                compare_metric = st.selectbox("Select Metric:", data.columns[metrics_cols], index=0, key="compare_metrics")
+
+        # By default compare the previous period with the current one
+        periods = sorted(pd.Series(dataset.values[period_col]).dropna(), key=str)  # Missing periods cannot be compared
+        segments = {}
+        for segment_col, label in zip([col2, col3], SEGMENT_LABELS):
+            with segment_col:
+                with st.expander(f"Segment {label}"):
+                    selections = {}
+                    for col in [period_col, feature_2_col, feature_1_col]:
+                        default = dataset.values[col]
+                        if col == period_col and len(periods) > 1:
+                            default = [periods[-2] if label == SEGMENT_LABELS[0] else periods[-1]]
+                        selections[col] = st.multiselect(f"Select {data.columns[col]}:", dataset.values[col], default=default, key=f"compare_{label}_{col}")
+                    segments[label] = selections
+
+        # Both segments share the filter indexes of the dataset version and are computed in one grouped pass
+        masks = {label: dataset.mask({**selections, **answer_filters}) for label, selections in segments.items()}
+        segment_key = (dataset_name, dataset.version, division_col, answer_key) + tuple(
+            (label, tuple((col, tuple(values)) for col, values in selections.items())) for label, selections in segments.items())
+        first, second = SEGMENT_LABELS
+        empty = [label for label, mask in masks.items() if not mask.any()]
+
+        if empty:
+            st.warning(f"Segment {' and '.join(empty)} has no responses, select other filters")
+        elif compare_metric in data.columns[boolean_cols] or compare_metric in data.columns[numeric_cols]:
+            # All Yes/No and numeric metrics at once, switching the metric is a lookup
+            intervals = cache.get_or_compute('segments', segment_key, lambda: compare_segments(
+                data, masks, division_col, data.columns[boolean_cols], data.columns[numeric_cols]))
+            boolean = compare_metric in data.columns[boolean_cols]
+            differences = segment_differences(intervals, division_col, compare_metric, first, second, boolean=boolean)
+
+            col_segments, col_differences = st.columns([6, 6])
+            with col_segments:
+                segment_scores, segment_avg = division_scores(intervals, division_col, 'segment', compare_metric)
+                fig = cached_figure(('segment score', compare_metric) + segment_key,
+                                    lambda: build_score_chart(segment_scores, segment_avg, division_col, 'segment', compare_metric, boolean=boolean))
+                st.plotly_chart(fig, use_container_width=True, key='compare_scores')
+            with col_differences:
+                fig = cached_figure(('segment difference', compare_metric) + segment_key,
+                                    lambda: build_difference_chart(differences, division_col, compare_metric, first, second, boolean=boolean))
+                st.plotly_chart(fig, use_container_width=True, key='compare_differences')
+
+            value_format = "%.1f%%" if boolean else "%.2f"
+            shown = differences.copy()
+            if boolean:
+                shown[[f'mean {first}', f'mean {second}', 'difference', 'lower', 'upper']] *= 100  # Percentages and percentage points
+            st.dataframe(shown, hide_index=True, use_container_width=True, column_config={
+                col: st.column_config.NumberColumn(format=value_format) for col in [f'mean {first}', f'mean {second}', 'difference', 'lower', 'upper']})
+        else:
+            # Option counts of both segments in one grouped pass, the segment takes the place of the period
+            counts = cache.get_or_compute('segment_option_counts', segment_key + (compare_metric,), lambda: option_counts(
+                stack_segments(data, masks, [division_col, compare_metric]), division_col, 'segment', compare_metric,
+                multi_select=compare_metric in data.columns[multi_select_cols]))
+            fig = cached_figure(('segment select', top_k_options, compare_metric) + segment_key,
+                                lambda: build_select_chart(counts, division_col, 'segment', compare_metric, top_k_options,
+                                                           note=f"Segment {second} is in solid colors, segment {first} striped"),
+                                decimals=PERCENT_DECIMALS)
+            st.plotly_chart(fig, use_container_width=True, key='compare_select')
+
+            st.caption(f"Difference in the share of answers, {second} - {first} (percentage points)")
+            st.dataframe(option_differences(counts, division_col, first, second), use_container_width=True,
+                         column_config={option: st.column_config.NumberColumn(format="%+.1f") for option in counts.columns})
+
+    with tab4:
+        # Filters with separate expanders
+        col1, col2, col3, col4 = st.columns([3, 3, 3, 3])
+        with col1:
+            with st.expander("Period"):
+                grid_period = st.multiselect(f"Select {data.columns[period_col]}:", dataset.values[period_col], default=dataset.values[period_col], key="grid_period")
+
+        with col2:
+            with st.expander("Metrics"):
+                grid_metrics = st.multiselect("Select Metrics:", data.columns[metrics_cols], default=list(data.columns[metrics_cols][:GRID_COLUMNS * 2]), key="grid_metrics")
+
+        with col3:
+            with st.expander(f"{data.columns[feature_2_col]}"):
+                grid_feature_2 = st.multiselect(f"Select {data.columns[feature_2_col]}:", dataset.values[feature_2_col], default=dataset.values[feature_2_col], key="grid_feature_2")
+
+        with col4:
+            with st.expander(f"{data.columns[feature_1_col]}"):
+                grid_feature_1 = st.multiselect(f"Select {data.columns[feature_1_col]}:", dataset.values[feature_1_col], default=dataset.values[feature_1_col], key="grid_feature_1")
+
+        # One pass for all Yes/No and numeric metrics and one for all the select metrics of the grid
+        grid_select = [metric for metric in grid_metrics if metric in data.columns[single_select_cols] or metric in data.columns[multi_select_cols]]
+        grid_intervals = get_intervals(grid_period, grid_feature_2, grid_feature_1, division_col) if len(grid_select) < len(grid_metrics) else None
+        grid_counts = get_batch_option_counts(grid_period, grid_feature_2, grid_feature_1, division_col, grid_select) if grid_select else {}
+        grid_key = filter_key(grid_period, grid_feature_2, grid_feature_1, division_col)
+
+        # Function to build the chart of one metric of the grid, sharing the figure cache with the first tab
+        def build_grid_figure(metric):
+            if metric in grid_counts:
+                return cached_figure(('select', top_k_options, metric) + grid_key,
+                                     lambda: build_select_chart(grid_counts[metric], division_col, data.columns[period_col], metric, top_k_options),
+                                     decimals=PERCENT_DECIMALS)
+            scores, scores_avg = division_scores(grid_intervals, division_col, data.columns[period_col], metric)
+            return cached_figure(('score', metric) + grid_key,
+                                 lambda: build_score_chart(scores, scores_avg, division_col, data.columns[period_col], metric,
+                                                           boolean=metric in data.columns[boolean_cols]))
+
+        # Figures are built in the background while the previous ones are drawn
+        grid_figures = [get_figure_executor().submit(build_grid_figure, metric) for metric in grid_metrics]
+        for row in range(0, len(grid_metrics), GRID_COLUMNS):
+            grid_cols = st.columns(GRID_COLUMNS)
+            for grid_col, metric, figure in zip(grid_cols, grid_metrics[row:row + GRID_COLUMNS], grid_figures[row:row + GRID_COLUMNS]):
+                fig = figure.result()
+                fig.update_layout(height=GRID_CHART_HEIGHT)
+                grid_col.plotly_chart(fig, use_container_width=True, key=f"grid_chart_{metric}")
+
+# Sidebar section to export the numbers behind every chart for the filters of the first tab
+with st.sidebar:
+    with st.expander("Export"):
+        export_format = st.selectbox("Export format", EXPORT_FORMATS, index=EXPORT_FORMATS.index('excel'), key="export_format")
+        if st.button("Prepare export", key="export_prepare"):
+            export_filters = {
+                data.columns[period_col]: st.session_state['division_period'],
+                data.columns[feature_2_col]: st.session_state['division_feature_2'],
+                data.columns[feature_1_col]: st.session_state['division_feature_1'],
+            }
+            with st.spinner("Exporting all metrics..."):
+                st.session_state['export_file'] = export_to_bytes(data[dataset.mask(answer_filters)], division_col, export_format, export_filters)
+        if 'export_file' in st.session_state:
+            export_name, export_bytes = st.session_state['export_file']
+            st.download_button("Download export", data=export_bytes, file_name=export_name, key="export_download")
+
+# Debug view of the caches, shown with ?debug=1 in the URL
+if st.query_params.get('debug') == '1':
+    with st.sidebar:
+        with st.expander("Cache statistics", expanded=True):
+            st.caption(f"{cache.total_bytes / 2**20:.1f} MB held of a {cache.budget_bytes / 2**20:.0f} MB budget")
+            st.dataframe(cache.stats(), hide_index=True, column_config={'hit rate': st.column_config.NumberColumn(format="%.2f")})
+            disk_cache = get_disk_cache()
+            if disk_cache is not None:
+                st.caption(f"On disk in {disk_cache.path}, capped at {disk_cache.budget_bytes / 2**20:.0f} MB")
+                st.dataframe(pd.DataFrame(disk_cache.stats(), columns=['cache', 'entries', 'bytes held']), hide_index=True)
+            st.caption("Average bytes sent per chart")
+            st.dataframe(payload.stats(), hide_index=True, column_config={'KB before': st.column_config.NumberColumn(format="%.1f"), 'KB after': st.column_config.NumberColumn(format="%.1f"), 'saved': st.column_config.NumberColumn(format="%.2f")})
+            st.caption(f"Datasets held of a {registry.budget_bytes / 2**20:.0f} MB budget")
+            st.dataframe(pd.DataFrame(registry.stats()), hide_index=True, column_config={'idle seconds': st.column_config.NumberColumn(format="%.0f")})
@@ -0,0 +1,47 @@
+import argparse  # Import argparse for the command line interface
+import os  # Import os to locate the application modules
+import sys  # Import sys to extend the module search path
+import tempfile  # Import tempfile for the synthetic exports
+import time  # Import time for timing the loads
+import tracemalloc  # Import tracemalloc for the peak memory of each load
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Make app modules importable
+
+import pandas as pd  # noqa: E402
+
+from dataset import load_chunked, prepare_data  # noqa: E402
+from synthetic import make_survey  # noqa: E402
+
+
+# Function to load an export and report its time, the memory held by the result and the peak memory traced during the load
+def measure(load):
+    tracemalloc.start()
+    start = time.perf_counter()
+    data = load()  # noqa: F841, kept alive while the memory is read
+    elapsed = time.perf_counter() - start
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, held, peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare loading an export in one go with loading it in chunks")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 500_000], help="Rows of the synthetic CSV exports")
+    parser.add_argument('--xlsx-rows', type=int, default=20_000, help="Rows of the synthetic workbook, 0 to skip it")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    exports = []
+    for n_rows in args.rows:
+        exports.append(os.path.join(directory, f'survey_{n_rows}.csv'))
+        make_survey(n_rows=n_rows).to_csv(exports[-1], index=False)
+    if args.xlsx_rows:
+        exports.append(os.path.join(directory, f'survey_{args.xlsx_rows}.xlsx'))
+        make_survey(n_rows=args.xlsx_rows).to_excel(exports[-1], index=False)
+
+    print(f"{'export':>20} {'loader':>8} {'seconds':>8} {'held MB':>8} {'peak MB':>8} {'overhead MB':>12}")
+    for path in exports:
+        read = pd.read_csv if path.endswith('.csv') else pd.read_excel
+        for name, load in [('one go', lambda: prepare_data(read(path))), ('chunked', lambda: load_chunked(path))]:
+            elapsed, held, peak = measure(load)
+            print(f"{os.path.basename(path):>20} {name:>8} {elapsed:>8.2f} {held / 2**20:>8.0f} {peak / 2**20:>8.0f} {(peak - held) / 2**20:>12.0f}")
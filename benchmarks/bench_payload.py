@@ -0,0 +1,31 @@
+import os  # Import os to locate the application modules
+import sys  # Import sys to extend the module search path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Make app modules importable
+
+from aggregates import compute_intervals, division_scores, option_counts  # noqa: E402
+from charts import build_score_chart, build_select_chart  # noqa: E402
+from dataset import classify_columns, prepare_data  # noqa: E402
+from payload import PAYLOAD_DECIMALS, PERCENT_DECIMALS, PayloadMeter  # noqa: E402
+from synthetic import make_survey  # noqa: E402
+
+
+if __name__ == '__main__':
+    # Bytes of figure JSON sent to the browser per chart, as produced by the builders and after compact_figure
+    print(f"{'divisions':>9} {'chart':>7} {'KB before':>10} {'KB after':>9} {'saved':>6}")
+    for n_divisions in (10, 40, 150):
+        data = prepare_data(make_survey(n_rows=50_000, n_divisions=n_divisions, n_options=12))
+        boolean_cols, numeric_cols, single_select_cols, multi_select_cols = classify_columns(data)
+        intervals = compute_intervals(data, 'Programme', 'Year', data.columns[boolean_cols], data.columns[numeric_cols])
+
+        meter = PayloadMeter(sample_every=1)  # Measure every figure
+        for col in boolean_cols + numeric_cols:
+            average_metrics, overall_avg = division_scores(intervals, 'Programme', 'Year', data.columns[col])
+            fig = build_score_chart(average_metrics, overall_avg, 'Programme', 'Year', data.columns[col], boolean=col in boolean_cols)
+            meter.compact('score', fig, PAYLOAD_DECIMALS)
+        for col in single_select_cols + multi_select_cols:
+            counts = option_counts(data, 'Programme', 'Year', data.columns[col], multi_select=col in multi_select_cols)
+            meter.compact('select', build_select_chart(counts, 'Programme', 'Year', data.columns[col]), PERCENT_DECIMALS)
+
+        for _, row in meter.stats().iterrows():
+            print(f"{n_divisions:>9} {row['chart']:>7} {row['KB before']:>10.1f} {row['KB after']:>9.1f} {row['saved']:>6.0%}")
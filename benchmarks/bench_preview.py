@@ -0,0 +1,36 @@
+import os  # Import os to locate the application modules
+import sys  # Import sys to extend the module search path
+import time  # Import time for timing the computations
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Make app modules importable
+
+from aggregates import approximate_intervals, compute_intervals  # noqa: E402
+from dataset import prepare_data  # noqa: E402
+from synthetic import make_survey  # noqa: E402
+
+
+# Function to time a computation, keeping the best of a few runs
+def timed(compute, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = compute()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == '__main__':
+    print(f"{'rows':>9} {'per stratum':>11} {'exact s':>8} {'sample s':>9} {'mean abs err':>13} {'coverage':>9}")
+    for n_rows in (100_000, 1_000_000):
+        data = prepare_data(make_survey(n_rows=n_rows, n_divisions=40))
+        boolean_metrics = ['Yes/No question (Y/N)']
+        numeric_metrics = [c for c in data.columns if c.startswith('Numeric question')]
+        exact_time, exact = timed(lambda: compute_intervals(data, 'Programme', 'Year', boolean_metrics, numeric_metrics))
+
+        for per_stratum in (50, 200, 1000):
+            sample_time, (approx, _) = timed(lambda: approximate_intervals(data, 'Programme', 'Year', boolean_metrics,
+                                                                           numeric_metrics, per_stratum=per_stratum))
+            # Relative error of the division means and share of exact means inside the sampled intervals
+            error = ((approx['mean'] - exact['mean']).abs() / exact['mean'].abs()).mean()
+            coverage = ((exact['mean'] >= approx['lower']) & (exact['mean'] <= approx['upper'])).mean()
+            print(f"{n_rows:>9} {per_stratum:>11} {exact_time:>8.3f} {sample_time:>9.3f} {error:>12.2%} {coverage:>9.1%}")
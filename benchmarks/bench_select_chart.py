@@ -0,0 +1,74 @@
+import os  # Import os to locate the application modules
+import sys  # Import sys to extend the module search path
+import time  # Import time for timing the builders
+
+import pandas as pd  # Import pandas for data manipulation
+import plotly.graph_objects as go  # Import Plotly Graph Objects for the legacy builder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Make app modules importable
+
+from aggregates import option_counts  # noqa: E402
+from charts import COLOR_LIST, build_select_chart  # noqa: E402
+from synthetic import make_survey  # noqa: E402
+
+
+# Function reproducing the previous stacked bar builder (one trace per period, custom shape legend)
+def legacy_select_chart(average_metrics, division_col, period_col_name, selected_metric):
+    total_counts = average_metrics.groupby([division_col, period_col_name])['count'].transform('sum')
+    average_metrics['percentage'] = average_metrics['count'] / total_counts * 100
+    average_metrics.sort_values(by=[division_col, period_col_name, selected_metric], inplace=True)
+    unique_metrics = average_metrics[selected_metric].unique()
+    color_map = {metric: COLOR_LIST[i % len(COLOR_LIST)] for i, metric in enumerate(unique_metrics)}
+    unique_periods = average_metrics[period_col_name].unique()
+    average_metrics.sort_values(by=division_col, inplace=True, ascending=False)
+    overall_avg = average_metrics.groupby([period_col_name, selected_metric]).agg({'count': 'sum'}).reset_index()
+    overall_avg['percentage'] = overall_avg['count'] / overall_avg.groupby(period_col_name)['count'].transform('sum') * 100
+    overall_avg[division_col] = 'Overall Average'
+    average_metrics[selected_metric] = pd.Categorical(average_metrics[selected_metric], categories=unique_metrics, ordered=True)
+    average_metrics.sort_values(by=[division_col, selected_metric], inplace=True)
+    average_metrics = pd.concat([overall_avg, average_metrics], ignore_index=True)
+
+    traces = []
+    for i, period in enumerate(unique_periods):
+        period_data = average_metrics[average_metrics[period_col_name] == period]
+        traces.append(go.Bar(
+            x=period_data['percentage'], y=period_data[division_col], name=f'{period}', orientation='h',
+            text=period_data['percentage'].apply(lambda x: f'{x:.1f}%'), textposition='inside',
+            marker=dict(color=[color_map[val] for val in period_data[selected_metric]],
+                        pattern=dict(shape="/" if i == 1 else "", size=2)),
+            width=0.4
+        ))
+    fig = go.Figure(data=traces)
+    for i, (metric, color) in enumerate(color_map.items()):
+        current_y = 1 - i * 0.04
+        fig.add_shape(type="rect", x0=1, x1=1.03, y0=current_y, y1=current_y + 0.03, line=dict(color=color),
+                      fillcolor=color, xref='paper', yref='paper')
+        fig.add_annotation(x=1.04, y=current_y + 0.015, text=metric, showarrow=False, xanchor='left',
+                           yanchor='middle', xref='paper', yref='paper')
+    fig.update_layout(showlegend=False, yaxis=dict(categoryorder='array',
+                                                   categoryarray=average_metrics[division_col].unique()))
+    return fig
+
+
+# Function to time a builder and measure the size of the figure sent to the browser
+def measure(build, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fig = build()
+        payload = fig.to_json()
+        best = min(best, time.perf_counter() - start)
+    return best, len(payload)
+
+
+if __name__ == '__main__':
+    metric = 'Single select question (Single Select)'
+    print(f"{'options':>8} {'legacy s':>9} {'legacy KB':>10} {'new s':>7} {'new KB':>7}")
+    for n_options in (5, 15, 50, 100):
+        survey = make_survey(n_rows=20000, n_divisions=40, n_options=n_options)
+        legacy_input = survey.groupby(['Programme', 'Year', metric]).size().reset_index(name='count')
+
+        legacy_time, legacy_bytes = measure(lambda: legacy_select_chart(legacy_input.copy(), 'Programme', 'Year', metric))
+        new_time, new_bytes = measure(lambda: build_select_chart(option_counts(survey, 'Programme', 'Year', metric),
+                                                                 'Programme', 'Year', metric))
+        print(f"{n_options:>8} {legacy_time:>9.3f} {legacy_bytes / 1024:>10.0f} {new_time:>7.3f} {new_bytes / 1024:>7.0f}")
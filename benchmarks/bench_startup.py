@@ -0,0 +1,95 @@
+import argparse  # Import argparse for the command line interface
+import asyncio  # Import asyncio for the websocket session
+import os  # Import os to locate the application modules
+import subprocess  # Import subprocess to import modules in a fresh interpreter
+import sys  # Import sys to extend the module search path
+import tempfile  # Import tempfile for the synthetic workbook
+import time  # Import time for the timeline of the first run
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # Make app modules importable
+
+from streamlit.proto.BackMsg_pb2 import BackMsg  # noqa: E402
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg  # noqa: E402
+from tornado.websocket import websocket_connect  # noqa: E402
+
+from loadtest import start_server  # noqa: E402
+from synthetic import make_survey  # noqa: E402
+
+# Modules in the order the first run of app.py needs them, the last ones are only needed by charts
+STARTUP_MODULES = ['streamlit', 'pandas', 'aggregates', 'charts', 'export', 'dataset', 'registry', 'cache_manager', 'api', 'payload']
+CHART_MODULES = ['plotly.io', 'plotly.express', 'streamlit_plotly_events']
+
+IMPORT_SCRIPT = """
+import sys, time
+sys.path.insert(0, {root!r})
+for name in {modules!r}:
+    start = time.perf_counter()
+    __import__(name)
+    print(name, time.perf_counter() - start)
+"""
+
+
+# Function to measure what each module adds to the import time, in a fresh interpreter
+def import_breakdown(modules):
+    output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT.format(root=ROOT, modules=modules)],
+                            capture_output=True, text=True, check=True).stdout
+    return [(name, float(seconds)) for name, seconds in (line.split() for line in output.splitlines())]
+
+
+# Function to run the script once over the websocket and time when the first message, widget and chart arrive
+async def first_run(url):
+    ws = await websocket_connect(url, max_message_size=1 << 30)
+    start = time.perf_counter()
+    await ws.write_message(BackMsg(rerun_script={}).SerializeToString(), binary=True)
+    timeline = {}
+    while 'script finished' not in timeline:
+        forward = ForwardMsg()
+        forward.ParseFromString(await ws.read_message())
+        elapsed = time.perf_counter() - start
+        timeline.setdefault('first message', elapsed)
+        if forward.WhichOneof('type') == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+            kind = forward.delta.new_element.WhichOneof('type')
+            if kind in ('selectbox', 'multiselect', 'slider', 'checkbox'):
+                timeline.setdefault('first widget', elapsed)
+            elif kind == 'progress':
+                timeline.setdefault('load progress', elapsed)
+            elif kind in ('plotly_chart', 'component_instance'):
+                timeline.setdefault('first chart', elapsed)
+        elif forward.WhichOneof('type') == 'script_finished':
+            timeline['script finished'] = elapsed
+    ws.close()
+    return timeline
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Break down the import time and the first paint of the dashboard")
+    parser.add_argument('--data', help="Survey workbook (defaults to a synthetic one)")
+    parser.add_argument('--rows', type=int, default=20000, help="Rows of the synthetic workbook")
+    parser.add_argument('--port', type=int, default=8599, help="Port of the Streamlit server")
+    args = parser.parse_args()
+
+    print("import time (each module after the previous ones)")
+    for name, seconds in import_breakdown(STARTUP_MODULES + CHART_MODULES):
+        print(f"  {name:<24} {seconds * 1000:>7.0f} ms{'  (deferred to the first chart)' if name in CHART_MODULES else ''}")
+
+    data_path = args.data
+    if data_path is None:
+        data_path = os.path.join(tempfile.mkdtemp(), 'synthetic.xlsx')
+        make_survey(n_rows=args.rows).to_excel(data_path, index=False)
+
+    server_start = time.perf_counter()
+    server = start_server(data_path, args.port)
+    server_ready = time.perf_counter() - server_start
+    try:
+        url = f'ws://localhost:{args.port}/_stcore/stream'
+        cold = asyncio.run(first_run(url))  # Nothing imported or loaded yet
+        warm = asyncio.run(first_run(url))  # A new session once everything is loaded
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"\nfirst paint (server ready after {server_ready:.1f} s)")
+    print(f"  {'':<16} {'cold s':>7} {'warm s':>7}")
+    for event in ['first message', 'first widget', 'load progress', 'first chart', 'script finished']:
+        print(f"  {event:<16} {cold.get(event, float('nan')):>7.2f} {warm.get(event, float('nan')):>7.2f}")
@@ -0,0 +1,222 @@
+import argparse  # Import argparse for the command line interface
+import asyncio  # Import asyncio to drive many sessions from one process
+import json  # Import json for the simulated chart clicks
+import os  # Import os to locate the application and pass the dataset
+import random  # Import random for the user action sequences
+import subprocess  # Import subprocess to start the Streamlit server
+import sys  # Import sys to extend the module search path
+import tempfile  # Import tempfile for the synthetic workbook
+import time  # Import time for rerun latencies
+import urllib.request  # Import urllib to wait for the server to be healthy
+
+import numpy as np  # Import NumPy for latency percentiles
+from streamlit.proto.BackMsg_pb2 import BackMsg  # Import the messages the browser sends
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg  # Import the messages the server sends
+from tornado.websocket import websocket_connect  # Import the websocket client shipped with Streamlit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # Make app modules importable
+
+from dataset import DIVISION_CANDIDATES, load_data  # noqa: E402
+from synthetic import make_survey  # noqa: E402
+
+ACTIONS = ['metric', 'period', 'feature', 'division', 'click']  # User actions every rerun is drawn from
+
+
+# Function to start the dashboard in a headless Streamlit server and wait until it is healthy
+def start_server(data_path, port):
+    # A fresh disk cache for every run, the persistent one of the repo would make every run after the first a warm one
+    env = dict(os.environ, DASHBOARD_DATA=data_path, DASHBOARD_CACHE_DIR=tempfile.mkdtemp(prefix='dashboard_cache_'))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', os.path.join(ROOT, 'app.py'), '--server.headless', 'true',
+         '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(f'http://localhost:{port}/_stcore/health', timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("Streamlit server did not start")
+
+
+# Function to sample the resident memory of the server until stopped, keeping the peak
+async def sample_rss(pid, stop, peak):
+    try:
+        import psutil  # Optional dependency, RSS is reported only when available
+    except ImportError:
+        return
+    process = psutil.Process(pid)
+    while not stop.is_set():
+        peak[0] = max(peak[0], process.memory_info().rss)
+        await asyncio.sleep(0.05)
+
+
+# One browser tab, speaking the websocket protocol of the Streamlit frontend
+class Session:
+    def __init__(self, url):
+        self.url = url
+        self.widgets = {}  # Widget id -> element proto of the widgets rendered by the last run
+        self.states = {}  # Widget id -> value sent back with every rerun, like the frontend does
+        self.bytes_received = 0
+        self.errors = []  # Exceptions shown by the app
+
+    async def connect(self):
+        self.ws = await websocket_connect(self.url, max_message_size=1 << 30)
+
+    # Function to rerun the script with the current widget values and wait until it has finished
+    async def rerun(self):
+        msg = BackMsg()
+        msg.rerun_script.widget_states.widgets.extend(self.states.values())
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+
+        rendered = {}
+        while True:
+            data = await self.ws.read_message()
+            if data is None:
+                raise ConnectionError("Server closed the session")
+            self.bytes_received += len(data)
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            if forward.WhichOneof('type') == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                kind = element.WhichOneof('type')
+                if kind in ('selectbox', 'multiselect', 'component_instance'):
+                    rendered[getattr(element, kind).id] = (kind, getattr(element, kind))
+                elif kind == 'exception':
+                    self.errors.append(element.exception.message)
+            elif forward.WhichOneof('type') == 'script_finished':
+                break
+
+        # Keep the values of widgets that are still on screen, new widgets start from their default
+        self.widgets = rendered
+        states = {}
+        for widget_id, (kind, widget) in rendered.items():
+            if widget_id in self.states:
+                states[widget_id] = self.states[widget_id]
+            elif kind == 'selectbox':
+                states[widget_id] = self._state(widget_id, int_value=widget.default)
+            elif kind == 'multiselect':
+                states[widget_id] = self._state(widget_id, int_array_value=list(widget.default))
+        self.states = states
+
+    # Function to find a rendered widget by its key or label
+    def find(self, kind, key=None, label=None):
+        for widget_id, (widget_kind, widget) in self.widgets.items():
+            if widget_kind == kind and (widget_id.endswith(f'-{key}') if key else widget.label == label):
+                return widget
+        return None
+
+    # Function to set the value the next rerun sends for a widget
+    def set(self, widget, **value):
+        self.states[widget.id] = self._state(widget.id, **value)
+
+    def _state(self, widget_id, int_value=None, int_array_value=None, json_value=None):
+        msg = BackMsg().rerun_script.widget_states.widgets.add()
+        msg.id = widget_id
+        if int_value is not None:
+            msg.int_value = int_value
+        elif int_array_value is not None:
+            msg.int_array_value.data.extend(int_array_value)
+        else:
+            msg.json_value = json_value
+        return msg
+
+
+# Function to apply one random user action to a session
+def apply_action(session, rng, division_names):
+    action = rng.choice(ACTIONS)
+    scatter = session.find('component_instance', key='scatter')
+    if action == 'click' and scatter is None:
+        action = 'metric'  # Select metrics have no scatter chart to click on
+    if action == 'metric':
+        widget = session.find('selectbox', key='division_metrics')
+        session.set(widget, int_value=rng.randrange(len(widget.options)))
+    elif action == 'period':
+        widget = session.find('multiselect', key='division_period')
+        session.set(widget, int_array_value=sorted(rng.sample(range(len(widget.options)), rng.randint(1, len(widget.options)))))
+    elif action == 'feature':
+        widget = session.find('multiselect', key=rng.choice(['division_feature_1', 'division_feature_2']))
+        session.set(widget, int_array_value=sorted(rng.sample(range(len(widget.options)), rng.randint(1, len(widget.options)))))
+    elif action == 'division':
+        widget = session.find('selectbox', label="Select Division Column")
+        session.set(widget, int_value=rng.randrange(len(widget.options)))
+    else:
+        division_col = DIVISION_CANDIDATES[session.states[session.find('selectbox', label="Select Division Column").id].int_value]
+        point = {'x': rng.choice(division_names[division_col]), 'y': 0, 'curveNumber': 0, 'pointNumber': 0}
+        session.set(scatter, json_value=json.dumps(json.dumps([point])))  # The component sends its points as a JSON string
+    return action
+
+
+# Function to run one simulated user and record the latency of each rerun
+async def run_session(session_id, url, steps, division_names, latencies):
+    rng = random.Random(session_id)
+    session = Session(url)
+    await session.connect()
+
+    start = time.perf_counter()
+    await session.rerun()
+    latencies.append(('initial load', time.perf_counter() - start))
+    for _ in range(steps):
+        action = apply_action(session, rng, division_names)
+        start = time.perf_counter()
+        await session.rerun()
+        latencies.append((action, time.perf_counter() - start))
+    session.ws.close()
+    return session.bytes_received, session.errors
+
+
+# Function to run all sessions concurrently against one server and report the results
+async def load_test(url, sessions, steps, division_names, server_pid):
+    stop, peak = asyncio.Event(), [0]
+    sampler = asyncio.ensure_future(sample_rss(server_pid, stop, peak))
+    latencies = []
+    start = time.perf_counter()
+    results = await asyncio.gather(*[run_session(i, url, steps, division_names, latencies) for i in range(sessions)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await sampler
+    received = sum(bytes_received for bytes_received, _ in results)
+    errors = [error for _, session_errors in results for error in session_errors]
+    return latencies, elapsed, received, errors, peak[0]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate concurrent dashboard sessions and report rerun latency")
+    parser.add_argument('--sessions', type=int, default=8, help="Number of concurrent sessions")
+    parser.add_argument('--steps', type=int, default=20, help="User actions per session")
+    parser.add_argument('--data', help="Survey workbook (defaults to a synthetic one)")
+    parser.add_argument('--rows', type=int, default=20000, help="Rows of the synthetic workbook")
+    parser.add_argument('--port', type=int, default=8599, help="Port of the Streamlit server")
+    args = parser.parse_args()
+
+    data_path = args.data
+    if data_path is None:
+        data_path = os.path.join(tempfile.mkdtemp(), 'synthetic.xlsx')
+        make_survey(n_rows=args.rows).to_excel(data_path, index=False)
+    data = load_data(data_path)
+    division_names = {col: data.iloc[:, col].unique().tolist() for col in DIVISION_CANDIDATES}
+
+    server = start_server(data_path, args.port)
+    try:
+        url = f'ws://localhost:{args.port}/_stcore/stream'
+        latencies, elapsed, received, errors, peak_rss = asyncio.run(
+            load_test(url, args.sessions, args.steps, division_names, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+    # Report throughput, latency percentiles overall and per action, and peak memory of the server
+    print(f"{args.sessions} sessions x {args.steps} actions on {len(data):,} rows in {elapsed:.1f} s")
+    print(f"throughput: {len(latencies) / elapsed:.2f} reruns/s, {received / len(latencies) / 1024:.0f} KB per rerun")
+    print(f"{'action':>14} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for action in ['all'] + sorted({a for a, _ in latencies}):
+        values = np.array([t for a, t in latencies if action in ('all', a)]) * 1000
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        print(f"{action:>14} {len(values):>6} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f}")
+    if peak_rss:
+        print(f"peak server RSS: {peak_rss / 2**20:.0f} MB")
+    for error in errors:
+        print(f"app exception: {error}")
@@ -0,0 +1,49 @@
+import argparse  # Import argparse for the command line interface
+import numpy as np  # Import NumPy for random survey answers
+import pandas as pd  # Import pandas for data manipulation
+
+
+# Function to generate a synthetic survey with the same column layout as data_cleaned_dummy.xlsx
+def make_survey(n_rows=10000, n_divisions=40, n_options=8, n_numeric=7, periods=(2023, 2024), seed=0):
+    rng = np.random.default_rng(seed)
+    options = [f"Option {i + 1}" for i in range(n_options)]
+
+    # Skewed option popularity so top-K folding has something to fold
+    weights = 1 / np.arange(1, n_options + 1)
+    weights = weights / weights.sum()
+
+    # Multi select answers: every respondent picks between one and three options
+    picks = rng.choice(n_options, size=(n_rows, 3), p=weights)
+    n_picks = rng.integers(1, 4, size=n_rows)
+    multi = [' | '.join(sorted({options[j] for j in row[:k]})) for row, k in zip(picks, n_picks)]
+
+    data = pd.DataFrame({
+        'Programme': [f"Programme {i:03d}" for i in rng.integers(0, n_divisions, size=n_rows)],
+        'Year': rng.choice(list(periods), size=n_rows),
+        'Department': [f"Department {i:02d}" for i in rng.integers(0, max(n_divisions // 4, 1), size=n_rows)],
+        'Campus': rng.choice(['London', 'Edinburgh', 'Manchester'], size=n_rows),
+    })
+    numeric = pd.DataFrame(rng.integers(1, 12, size=(n_rows, n_numeric)),  # Scores from 1 to 11 as in the real survey
+                           columns=[f"Numeric question {i + 1}" for i in range(n_numeric)])
+    data = pd.concat([data, numeric], axis=1)
+    data['Yes/No question (Y/N)'] = rng.choice(['Yes', 'No', 'yes', 'no'], size=n_rows)
+    data['Single select question (Single Select)'] = rng.choice(options, size=n_rows, p=weights)
+    data['Multi select question (Multi Select)'] = multi
+    return data
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic survey dataset")
+    parser.add_argument('output', help="Output .xlsx or .csv file")
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--divisions', type=int, default=40)
+    parser.add_argument('--options', type=int, default=8)
+    parser.add_argument('--numeric', type=int, default=7, help="Number of numeric questions")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    survey = make_survey(args.rows, args.divisions, args.options, args.numeric, seed=args.seed)
+    if args.output.endswith('.csv'):
+        survey.to_csv(args.output, index=False)
+    else:
+        survey.to_excel(args.output, index=False)
@@ -0,0 +1,130 @@
+import os  # Import os to read the configured memory budget
+import sys  # Import sys for the size of plain Python objects
+import threading  # Import threading to share the caches between sessions and background threads
+import time  # Import time to measure how expensive each artifact was to compute
+
+import numpy as np  # Import NumPy to size arrays
+import pandas as pd  # Import pandas to size DataFrames
+
+DEFAULT_BUDGET_MB = int(os.environ.get('DASHBOARD_CACHE_BUDGET_MB', '256'))  # Memory budget of all caches together
+# Caches also kept on disk when a disk cache is configured, their keys only hold plain values and the dataset version
+PERSISTENT_CACHES = ('intervals', 'sample_intervals', 'option_counts', 'batch_option_counts', 'segments', 'segment_option_counts',
+                     'rollup', 'figures', 'api')
+
+
+# Function to estimate the memory held by a cached value in bytes
+def sizeof(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        size = value.memory_usage(deep=True, index=True)
+        return int(size.sum() if isinstance(value, pd.DataFrame) else size)
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+# Single memory-budgeted cache for the derived artifacts of the app, split into named caches for telemetry
+class CacheManager:
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_MB * 1024 * 1024, disk=None):
+        self.budget_bytes = budget_bytes
+        self.disk = disk  # Optional DiskCache behind the persistent caches
+        self.total_bytes = 0
+        self._entries = {}  # (cache name, key) -> [value, size in bytes, priority, compute seconds]
+        self._stats = {}  # cache name -> counters
+        self._inflation = 0.0  # Priority of the last evicted entry (GreedyDual-Size clock)
+        self._lock = threading.Lock()
+
+    # Function to return the cached value of key, computing and storing it on a miss
+    def get_or_compute(self, cache_name, key, compute):
+        with self._lock:
+            stats = self._stats_for(cache_name)
+            entry = self._entries.get((cache_name, key))
+            if entry is not None:
+                stats['hits'] += 1
+                entry[2] = self._inflation + entry[3] / entry[1]  # Refresh the priority on every hit
+                return entry[0]
+            stats['misses'] += 1
+
+        # Another process, or this one before a restart, may already have computed it
+        persistent = self.disk is not None and cache_name in PERSISTENT_CACHES
+        if persistent:
+            stored = self.disk.get(cache_name, key)
+            if stored is not None:
+                with self._lock:
+                    stats['disk hits'] += 1
+                self.put(cache_name, key, *stored)
+                return stored[0]
+
+        # Compute outside the lock so other sessions are not blocked meanwhile
+        start = time.perf_counter()
+        value = compute()
+        cost = time.perf_counter() - start
+        self.put(cache_name, key, value, cost)
+        if persistent:
+            self.disk.put(cache_name, key, value, cost)
+        return value
+
+    # Function to store a value, evicting the entries that are cheapest to recompute per byte when over budget
+    def put(self, cache_name, key, value, cost):
+        size = max(sizeof(value), 1)
+        if size > self.budget_bytes:
+            return  # Never fits, do not flush everything else for it
+        with self._lock:
+            stats = self._stats_for(cache_name)
+            old = self._entries.pop((cache_name, key), None)
+            if old is not None:
+                self._release(cache_name, old)
+
+            # GreedyDual-Size: expensive and small artifacts are kept longer than cheap and large ones
+            self._entries[(cache_name, key)] = [value, size, self._inflation + cost / size, cost]
+            self.total_bytes += size
+            stats['bytes'] += size
+            stats['entries'] += 1
+
+            while self.total_bytes > self.budget_bytes:
+                victim = min(self._entries, key=lambda k: self._entries[k][2])
+                entry = self._entries.pop(victim)
+                self._inflation = entry[2]
+                self._release(victim[0], entry)
+                self._stats[victim[0]]['evictions'] += 1
+
+    # Function to drop every entry of a cache, or of all caches
+    def clear(self, cache_name=None):
+        with self._lock:
+            for cache_key in [k for k in self._entries if cache_name is None or k[0] == cache_name]:
+                self._release(cache_key[0], self._entries.pop(cache_key))
+
+    # Function to get the per-cache telemetry as a table
+    def stats(self):
+        with self._lock:
+            rows = []
+            for cache_name, stats in sorted(self._stats.items()):
+                lookups = stats['hits'] + stats['misses']
+                rows.append({
+                    'cache': cache_name,
+                    'entries': stats['entries'],
+                    'bytes held': stats['bytes'],
+                    'hits': stats['hits'],
+                    'misses': stats['misses'],
+                    'disk hits': stats['disk hits'],
+                    'hit rate': stats['hits'] / lookups if lookups else float('nan'),
+                    'evictions': stats['evictions'],
+                })
+            return pd.DataFrame(rows, columns=['cache', 'entries', 'bytes held', 'hits', 'misses', 'disk hits', 'hit rate', 'evictions'])
+
+    def _stats_for(self, cache_name):
+        if cache_name not in self._stats:
+            self._stats[cache_name] = {'hits': 0, 'misses': 0, 'disk hits': 0, 'evictions': 0, 'bytes': 0, 'entries': 0}
+        return self._stats[cache_name]
+
+    def _release(self, cache_name, entry):
+        self.total_bytes -= entry[1]
+        self._stats[cache_name]['bytes'] -= entry[1]
+        self._stats[cache_name]['entries'] -= 1
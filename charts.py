@@ -0,0 +1,282 @@
+import numpy as np  # Import NumPy for vectorized trace data
+
+# Plotly is imported by the builders themselves, so it is only loaded once a chart of that type is needed
+
+# Define a list of colors to be used for the options of select questions
+COLOR_LIST = [
+    "#1C4A86", "#DD1C1F", "#3ABE72",
+    "#581845", "#FFC300", "#DAF7A6",
+    "#FF5733", "#C70039", "#900C3F",
+    "#FF33FF", "#33FF57", "#5733FF",
+    "#33FFF5", "#FF3380", "#80FF33"
+]
+PERIOD_COLORS = ['#0C275C', '#6398DF']  # Colors of the current and previous period
+OTHER_COLOR = "#B0B0B0"  # Color of the folded "Other" option
+OTHER_LABEL = "Other"  # Name of the folded "Other" option
+TOP_K_OPTIONS = 10  # Default number of options shown before folding the rest into "Other"
+
+
+# Function to keep the top K options of a count matrix and fold the remaining ones into "Other"
+def fold_options(counts, top_k=TOP_K_OPTIONS):
+    # Rank options by their overall number of answers
+    totals = counts.sum(axis=0).sort_values(ascending=False, kind='stable')
+    if len(totals) <= top_k:
+        return counts[totals.index]
+
+    kept = totals.index[:top_k]
+    folded = counts[kept].copy()
+    # Added to a real "Other" answer among the top K options rather than replacing its counts
+    folded[OTHER_LABEL] = folded.get(OTHER_LABEL, 0) + counts[totals.index[top_k:]].sum(axis=1)
+    return folded
+
+
+# Function to build the stacked bar chart of a single or multi select metric from its count matrix
+def build_select_chart(counts, division_col, period_col_name, selected_metric, top_k=TOP_K_OPTIONS,
+                       note="Current period is in solid colors, previous period transparent"):
+    import plotly.graph_objects as go  # Import Plotly Graph Objects for advanced plotting
+    counts = fold_options(counts, top_k)
+    options = counts.columns.tolist()
+
+    # Calculate the overall distribution for comparison and put it first
+    overall = counts.groupby(level=period_col_name).sum()
+    divisions = ['Overall Average'] + sorted(counts.index.get_level_values(division_col).unique())
+    periods = sorted(overall.index, reverse=True)  # Current period first
+
+    # Dense (division x period x option) matrix, missing combinations are left empty
+    matrix = np.zeros((len(divisions), len(periods), len(options)))
+    division_pos = {name: i for i, name in enumerate(divisions)}
+    period_pos = {period: i for i, period in enumerate(periods)}
+    rows = [division_pos[d] for d in counts.index.get_level_values(division_col)]
+    cols = [period_pos[p] for p in counts.index.get_level_values(period_col_name)]
+    matrix[rows, cols] = counts.to_numpy()
+    matrix[0, [period_pos[p] for p in overall.index]] = overall.to_numpy()
+
+    # Percentage of each option within its division and period, and where each stacked segment starts
+    totals = matrix.sum(axis=2, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentage = np.where(totals > 0, matrix / totals * 100, 0)
+    base = np.cumsum(percentage, axis=2) - percentage
+
+    # Place the bars of each period next to each other around the division's position
+    bar_width = 0.4  # Adjust the bar thickness here
+    offsets = (np.arange(len(periods)) - (len(periods) - 1) / 2) * bar_width
+    y = np.arange(len(divisions))[:, np.newaxis] + offsets[np.newaxis, :]
+    division_labels = np.array(divisions, dtype=object)
+
+    # Create one trace per option and period covering every division, the periods of an option share a legend entry
+    traces = []
+    for k, option in enumerate(options):
+        color = OTHER_COLOR if option == OTHER_LABEL else COLOR_LIST[k % len(COLOR_LIST)]
+        for j, period in enumerate(periods):
+            x = percentage[:, j, k]
+            keep = x > 0  # Leave out empty segments, they get no bar or label
+            traces.append(go.Bar(
+                x=x[keep],
+                y=y[keep, j],
+                base=base[keep, j, k],
+                name=str(option),
+                legendgroup=str(option),
+                showlegend=j == 0,
+                orientation='h',
+                width=bar_width * 0.95,
+                texttemplate='%{x:.1f}%',  # Add labels on the bars
+                textposition='inside',  # Position the text inside the bars
+                customdata=division_labels[keep],
+                hovertemplate=f'%{{customdata}} ({period})<br>{option}: %{{x:.1f}}%<extra></extra>',
+                marker=dict(
+                    color=color,
+                    pattern=dict(shape="" if j == 0 else "/", size=2)  # Stripes for previous periods
+                )
+            ))
+
+    # Create the figure with the traces
+    fig = go.Figure(data=traces)
+
+    # Add annotation at the bottom of the chart
+    fig.add_annotation(
+        text=note,
+        xref="paper", yref="paper",
+        x=0.6, y=-0.05,
+        showarrow=False,
+        font=dict(size=12),
+        xanchor='center', yanchor='top'
+    )
+
+    fig.update_layout(
+        height=450,  # Total height of the visible area
+        width=700,
+        barmode='overlay',  # Segments are positioned explicitly through their base
+        showlegend=True,
+        legend=dict(x=1, y=1, xanchor='left', yanchor='top', traceorder='normal'),
+        title={'text': f"<b>{selected_metric}</b>", 'font': {'size': 12, 'color': 'black'}, 'x': 0, 'xanchor': 'left'},
+        xaxis=dict(
+            showticklabels=True,
+            showgrid=False,  # Remove vertical gridlines
+            zeroline=False,
+            range=[0, 110],
+            tickfont=dict(size=14, color='black')
+        ),
+        xaxis_title=None,
+        yaxis_title=None,
+        yaxis=dict(
+            showticklabels=True,  # Enable y-axis labels
+            showgrid=True,  # Show horizontal gridlines
+            zeroline=False,
+            automargin=True,  # Automatically adjust margin to fit y-axis labels
+            tickvals=list(range(len(divisions))),  # One tick per division
+            ticktext=divisions,
+            range=[-0.5, len(divisions) - 0.5],
+            tickfont=dict(size=14, color='black')  # Increase the size of y-axis labels
+        ),
+        margin=dict(l=30, r=70, t=25, b=15)
+    )
+    return fig
+
+
+# Function to build the scatter plot of a Yes/No or numeric metric against its overall average
+def build_score_chart(average_metrics, overall_avg, division_col, period_col_name, selected_metric, boolean=False):
+    import plotly.graph_objects as go  # Import Plotly Graph Objects for advanced plotting
+    # Traces, shapes and annotations are passed to the figure at once as plain data: validating them property by
+    # property (as plotly.express and add_hline do) took most of the time of building a chart
+    value_format = '.2%' if boolean else '.2f'  # Yes/No averages are shares of Yes answers
+    mean_label = 'Average score (%)' if boolean else 'Average score'
+
+    # One trace per period (Wilson confidence interval for Yes/No metrics, Student t for numeric ones)
+    traces = []
+    for i, period in enumerate(average_metrics[period_col_name].unique()):
+        color = PERIOD_COLORS[i % len(PERIOD_COLORS)]  # Cycle the colors when there are more than two periods
+        scores = average_metrics[average_metrics[period_col_name] == period]
+        traces.append(dict(
+            type='scatter', mode='markers', name=str(period), legendgroup=str(period),
+            x=scores[division_col], y=scores['mean'],
+            error_y=dict(type='data', array=scores['error_plus'], arrayminus=scores['error_minus']),
+            marker=dict(color=color, symbol='circle'),
+            hovertext=scores[division_col],
+            customdata=scores[['count', 'lower', 'upper']].to_numpy(),
+            hovertemplate=(f'<b>%{{hovertext}}</b><br><br>{period_col_name}={period}<br>{division_col}=%{{x}}'
+                           f'<br>{mean_label}=%{{y:{value_format}}}<br>Number of responses=%{{customdata[0]}}'
+                           f'<br>Lower 95% bound=%{{customdata[1]:{value_format}}}<br>Upper 95% bound=%{{customdata[2]:{value_format}}}<extra></extra>')
+        ))
+
+    # Highlight divisions whose interval does not contain the overall average
+    outliers = average_metrics[average_metrics['significant'].fillna(False).astype(bool)]
+    if not outliers.empty:
+        traces.append(dict(
+            type='scatter', mode='markers', name='Differs from average',
+            x=outliers[division_col], y=outliers['mean'],
+            hoverinfo='skip',  # Keep the hover of the underlying point
+            marker=dict(symbol='circle-open', size=14, color='#DD1C1F', line=dict(width=2))
+        ))
+
+    # Horizontal lines for the overall average score for each period, labelled at the top right
+    shapes, annotations = [], []
+    for i, period in enumerate(overall_avg[period_col_name]):
+        color = PERIOD_COLORS[i % len(PERIOD_COLORS)]
+        avg_score = overall_avg[overall_avg[period_col_name] == period][selected_metric].values[0]
+        shapes.append(dict(type='line', xref='x domain', x0=0, x1=1, yref='y', y0=avg_score, y1=avg_score,
+                           line=dict(color=color, width=2)))
+        annotations.append(dict(text=f"Avg: {avg_score:.1%}" if boolean else f"Avg: {avg_score:.1f}",
+                                xref='x domain', x=1, xanchor='right', yref='y', y=avg_score, yanchor='bottom',
+                                font=dict(size=10, color=color), showarrow=False))
+
+    if boolean:
+        yaxis = dict(tickformat=".0%", range=[0, 1.1])  # Percentage axis from 0% to 110%
+        margin = dict(l=30, r=5, t=25, b=5)
+    else:
+        yaxis = dict(range=[0, max(average_metrics['mean'].max(), average_metrics['upper'].max()) + 1])  # Fit the error bars
+        margin = dict(l=15, r=5, t=25, b=5)
+
+    return go.Figure(data=traces, layout=dict(
+        title={'text': f"<b>{selected_metric}</b>", 'font': {'size': 12, 'color': 'black'}, 'x': 0, 'xanchor': 'left'},
+        xaxis=dict(
+            showticklabels=False,
+            showgrid=False,  # Remove vertical gridlines
+            zeroline=False,
+            title=None
+        ),
+        yaxis=dict(
+            showticklabels=True,
+            showgrid=True,  # Show horizontal gridlines
+            zeroline=False,
+            title=None,
+            **yaxis
+        ),
+        legend=dict(
+            x=1, y=1,
+            xanchor='right', yanchor='top',
+            title_text=''
+        ),
+        shapes=shapes,
+        annotations=annotations,
+        margin=margin
+    ))
+
+
+# Function to build the chart of the difference between two segments for every division, with its confidence interval
+def build_difference_chart(differences, division_col, selected_metric, first, second, boolean=False):
+    import plotly.graph_objects as go  # Import Plotly Graph Objects for advanced plotting
+
+    significant = differences['significant'].to_numpy()
+    fig = go.Figure(go.Scatter(
+        x=differences[division_col],
+        y=differences['difference'],
+        mode='markers',
+        error_y=dict(type='data', array=differences['upper'] - differences['difference'],
+                     arrayminus=differences['difference'] - differences['lower']),
+        marker=dict(size=8, color=np.where(significant, '#DD1C1F', PERIOD_COLORS[0])),  # Red when the interval excludes 0
+        customdata=np.column_stack([differences[f'mean {first}'], differences[f'mean {second}']]),
+        hovertemplate=(f'%{{x}}<br>{second} - {first}: %{{y:{".1%" if boolean else ".2f"}}}'
+                       f'<br>{first}: %{{customdata[0]:{".1%" if boolean else ".2f"}}}'
+                       f'<br>{second}: %{{customdata[1]:{".1%" if boolean else ".2f"}}}<extra></extra>'),
+        showlegend=False
+    ))
+    fig.add_hline(y=0, line_color='black', line_width=1)
+
+    fig.update_layout(
+        title={'text': f"<b>{selected_metric}</b>: {second} - {first}", 'font': {'size': 12, 'color': 'black'}, 'x': 0, 'xanchor': 'left'},
+        xaxis=dict(
+            showticklabels=False,
+            showgrid=False,  # Remove vertical gridlines
+            zeroline=False
+        ),
+        yaxis=dict(
+            tickformat=".0%" if boolean else None,  # Differences of Yes/No questions are in percentage points
+            showgrid=True,  # Show horizontal gridlines
+            zeroline=False
+        ),
+        xaxis_title=None,
+        yaxis_title=None,
+        margin=dict(l=15, r=5, t=25, b=5)
+    )
+    return fig
+
+
+# Function to build the bar chart of the groups one level below a drill-down path, by the mean of a metric or their number of responses
+def build_breakdown_chart(children_avg, children_count, path, level_name, selected_metric=None, boolean=False):
+    import plotly.graph_objects as go  # Import Plotly Graph Objects for advanced plotting
+
+    children_avg = children_avg.dropna().sort_values(ascending=True)
+    value_format = ".0f" if selected_metric is None else ".1%" if boolean else ".1f"
+    fig = go.Figure(go.Bar(
+        x=children_avg.to_numpy(),
+        y=children_avg.index.astype(str),
+        orientation='h',
+        marker_color=PERIOD_COLORS[1],
+        customdata=children_count.reindex(children_avg.index).to_numpy(),
+        texttemplate=f'%{{x:{value_format}}}',
+        textposition='inside',
+        hovertemplate=f'%{{y}}<br>%{{x:{value_format}}}<br>Number of responses: %{{customdata}}<extra></extra>',
+        showlegend=False
+    ))
+
+    fig.update_layout(
+        title={'text': f"<b>{' › '.join(map(str, path))}</b> by {level_name}" + ("" if selected_metric is None else f"<br>{selected_metric}"),
+               'font': {'size': 12, 'color': 'black'}, 'x': 0, 'xanchor': 'left'},
+        xaxis=dict(showticklabels=False, showgrid=False, zeroline=False),
+        yaxis=dict(type='category', showgrid=False, fixedrange=True),  # Group names are labels even when they look like numbers
+        xaxis_title=None,
+        yaxis_title=None,
+        margin=dict(l=15, r=5, t=50 if selected_metric else 30, b=5),
+        height=max(150, 60 + 22 * len(children_avg))
+    )
+    return fig
@@ -0,0 +1,322 @@
+import json  # Import json to read the schema manifests
+import os  # Import os to find the schema manifest of a workbook
+
+import numpy as np  # Import NumPy for the column store of chunked loads
+import pandas as pd  # Import pandas for data manipulation
+
+# Define constant columns
+DIVISION_CANDIDATES = [0, 2, 3]  # Columns that can be used as division (the other two act as features)
+PERIOD_COL = 1  # Assuming 'Period' is always in the second column
+METRICS_START = 4  # Assuming metrics start from the 5th column
+
+YES_NO_MAP = {'yes': True, 'y': True, 'no': False, 'n': False}  # Accepted spellings of Yes/No answers
+
+SCHEMA_SUFFIX = '.schema.json'  # Optional manifest next to a workbook, e.g. survey.xlsx -> survey.schema.json
+METRIC_TYPES = ['Y/N', 'numeric', 'Single Select', 'Multi Select']  # Types a metric can be declared with
+ROLE_COUNTS = {'division': 3, 'period': 1}  # Columns of each role a manifest must declare, besides its metrics
+
+CHUNK_ROWS = 10000  # Responses typed at a time when an export is loaded in chunks
+STREAMING_MB = int(os.environ.get('DASHBOARD_STREAMING_MB', '50'))  # Workbooks larger than this are loaded in chunks, CSV exports always are
+
+
+# Error raised when a schema manifest or the workbook it describes is invalid
+class SchemaError(ValueError):
+    pass
+
+
+# Function to load the survey workbook and convert the columns to their working types, following its schema manifest if any
+def load_data(file_path, schema=None, progress=None):
+    if schema is None and isinstance(file_path, str):
+        schema = read_schema(file_path)
+    if isinstance(file_path, str) and is_streamed(file_path):
+        return load_chunked(file_path, schema, progress=progress)
+    if schema is not None:
+        return load_with_schema(file_path, schema)
+    data = pd.read_excel(file_path)  # Read the Excel file into a pandas DataFrame
+    return prepare_data(data)
+
+
+# Function to read only the column names of the survey workbook, without its responses
+def read_columns(file_path):
+    schema = read_schema(file_path)
+    if schema is not None:
+        return pd.Index(schema_columns(schema))  # The declared columns, in the layout the loader puts them in
+    return read_header(file_path)
+
+
+# Function to read the header row of a workbook or CSV export as it is in the file
+def read_header(file_path):
+    if file_path.endswith('.csv'):
+        return pd.read_csv(file_path, nrows=0).columns
+    return pd.read_excel(file_path, nrows=0).columns
+
+
+# Function to check whether an export is loaded in chunks rather than in one go
+def is_streamed(file_path):
+    return file_path.endswith('.csv') or os.path.getsize(file_path) > STREAMING_MB * 1024 * 1024
+
+
+# Function to get the path of the schema manifest of a workbook
+def schema_path(file_path):
+    return os.path.splitext(file_path)[0] + SCHEMA_SUFFIX
+
+
+# Function to read and check the schema manifest of a workbook, None when it has none
+def read_schema(file_path):
+    path = schema_path(file_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        schema = json.load(f)
+
+    # The manifest lists the columns as {"name", "role", "type", "options"}, type and options only for metrics
+    columns = schema.get('columns', [])
+    problems = []
+    for role, count in ROLE_COUNTS.items():
+        declared = sum(column.get('role') == role for column in columns)
+        if declared != count:
+            problems.append(f"{count} {role} column(s) expected, {declared} declared")
+    for column in columns:
+        if column.get('role') not in list(ROLE_COUNTS) + ['metric']:
+            problems.append(f"{column.get('name')}: unknown role {column.get('role')}")
+        elif column['role'] == 'metric' and column.get('type') not in METRIC_TYPES:
+            problems.append(f"{column.get('name')}: type must be one of {METRIC_TYPES}")
+    if not any(column.get('role') == 'metric' for column in columns):
+        problems.append("no metric column declared")
+    if len({column.get('name') for column in columns}) != len(columns):
+        problems.append("column names must be unique")
+    if problems:
+        raise SchemaError(f"{path}: " + "; ".join(problems))
+    return schema
+
+
+# Function to get the declared column names in the layout of the app: division, period, the two other divisions, then the metrics
+def schema_columns(schema):
+    divisions = [column['name'] for column in schema['columns'] if column['role'] == 'division']
+    period = [column['name'] for column in schema['columns'] if column['role'] == 'period']
+    metrics = [column['name'] for column in schema['columns'] if column['role'] == 'metric']
+    return divisions[:1] + period + divisions[1:] + metrics
+
+
+# Function to load only the declared columns of the workbook with explicit types, and check them against the manifest
+def load_with_schema(file_path, schema):
+    names = schema_columns(schema)
+    types = {column['name']: column['type'] for column in schema['columns'] if column['role'] == 'metric'}
+    # Only numeric metrics are parsed as numbers, every other column is text, so nothing has to be inferred
+    dtypes = {name: 'float64' if types.get(name) == 'numeric' else str for name in names}
+    try:
+        data = pd.read_excel(file_path, usecols=lambda name: name in dtypes, dtype=dtypes)
+    except ValueError as e:  # A numeric column with text answers
+        raise SchemaError(f"The workbook does not match its schema: {e}") from e
+    missing = [name for name in names if name not in data.columns]
+    if missing:
+        raise SchemaError(f"Columns declared in the schema are missing from the workbook: {missing}")
+    data = data[names]
+    check_answers(data, schema)  # Before converting them
+
+    for name, kind in types.items():
+        if kind == 'Y/N':
+            data[name] = data[name].str.lower().map(YES_NO_MAP)
+    data.attrs['metric_types'] = types  # Declared types, used by classify_columns instead of the column names
+    return data
+
+
+# Function to check the answers of the Y/N and select metrics of a (chunk of the) workbook against the declared option sets
+def check_answers(data, schema):
+    problems = []
+    for column in schema['columns']:
+        if column['role'] != 'metric' or column['type'] not in ('Y/N', 'Single Select', 'Multi Select'):
+            continue
+        answers = data[column['name']].dropna()
+        if column['type'] == 'Multi Select':
+            answers = answers.str.split('|').explode().str.strip()
+        if column['type'] == 'Y/N':
+            unknown = set(answers.str.lower()) - set(YES_NO_MAP)
+        else:
+            unknown = set(answers) - set(column['options']) if 'options' in column else set()
+        if unknown:
+            problems.append(f"{column['name']}: unexpected answers {sorted(unknown)[:5]}")
+    if problems:
+        raise SchemaError("The workbook does not match its schema: " + "; ".join(problems))
+
+
+# Function to get the type of every metric column, declared in the schema or detected from the column names
+def metric_types(columns, schema=None):
+    if schema is not None:
+        return {column['name']: column['type'] for column in schema['columns'] if column['role'] == 'metric'}
+    types = {}
+    for kind, cols in zip(['Y/N', 'numeric', 'Single Select', 'Multi Select'], classify_columns(pd.DataFrame(columns=columns))):
+        types.update({columns[col]: kind for col in cols})
+    return types
+
+
+# Function to load a large export in chunks, typing every chunk and appending it to a column store
+def load_chunked(file_path, schema=None, chunk_rows=CHUNK_ROWS, progress=None):
+    progress = progress or (lambda fraction: None)
+    columns = list(read_columns(file_path))
+    types = metric_types(columns, schema)
+    store = ColumnStore(columns, types)
+    for chunk, fraction in iter_chunks(file_path, columns, types, declared=schema is not None, chunk_rows=chunk_rows):
+        if schema is not None:
+            check_answers(chunk, schema)
+        store.append(type_chunk(chunk, types))
+        progress(fraction)
+    data = store.to_frame()
+    if schema is not None:
+        data.attrs['metric_types'] = types  # Declared types, used by classify_columns instead of the column names
+    return data
+
+
+# Function to read the raw responses of an export chunk by chunk as (frame of the columns, fraction of the file read)
+def iter_chunks(file_path, columns, types, declared=False, chunk_rows=CHUNK_ROWS):
+    header = list(read_header(file_path))
+    missing = [name for name in columns if name not in header]
+    if missing:
+        raise SchemaError(f"Columns declared in the schema are missing from the workbook: {missing}")
+
+    if file_path.endswith('.csv'):
+        # Text columns are read as text, numeric metrics as numbers when they are declared (inferred otherwise)
+        dtypes = {name: str for name in columns if types.get(name) != 'numeric'}
+        if declared:
+            dtypes.update({name: 'float64' for name in columns if types.get(name) == 'numeric'})
+        with open(file_path, 'rb') as f:
+            size = max(os.fstat(f.fileno()).st_size, 1)
+            for chunk in pd.read_csv(f, usecols=lambda name: name in columns, dtype=dtypes, chunksize=chunk_rows):
+                yield chunk[columns], min(f.tell() / size, 1.0)
+        return
+
+    from openpyxl import load_workbook  # Deferred, only needed for large workbooks
+    positions = [header.index(name) for name in columns]
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        total = max((sheet.max_row or 1) - 1, 1)
+        rows, read = [], 0
+        for row in sheet.iter_rows(min_row=2, values_only=True):
+            read += 1
+            if all(value is None for value in row):
+                continue  # Blank rows
+            rows.append([row[i] if i < len(row) else None for i in positions])
+            if len(rows) == chunk_rows:
+                yield text_chunk(rows, columns, types), min(read / total, 1.0)
+                rows = []
+        if rows:
+            yield text_chunk(rows, columns, types), 1.0
+    finally:
+        workbook.close()
+
+
+# Function to build a chunk of workbook rows with its text columns as text, like the dtypes of the CSV path.
+# Inferring them per chunk would e.g. turn the years of a chunk with a missing year into floats ('2024.0')
+def text_chunk(rows, columns, types):
+    chunk = pd.DataFrame(rows, columns=columns, dtype=object)
+    for name in columns:
+        if types.get(name) != 'numeric':
+            chunk[name] = chunk[name].astype(str).where(chunk[name].notna())
+    return chunk
+
+
+# Function to convert a raw chunk, read with its text columns as text, to its working types: Y/N answers to booleans and numbers to numbers
+def type_chunk(chunk, types):
+    for name, kind in types.items():
+        if kind == 'Y/N':
+            chunk[name] = chunk[name].str.lower().map(YES_NO_MAP)
+        elif kind == 'numeric':
+            chunk[name] = pd.to_numeric(chunk[name])
+    return chunk
+
+
+# Columns of a chunked load, text stored as codes into one dictionary per column so every distinct value is held once
+class ColumnStore:
+    def __init__(self, columns, types):
+        self.columns = columns
+        self.types = types  # Metric name -> type, the other columns are text
+        self._arrays = {name: [] for name in columns}  # Column -> typed arrays of the chunks
+        self._values = {name: {} for name in columns if types.get(name) != 'numeric'}  # Text column -> {value: code}
+
+    # Function to append a typed chunk
+    def append(self, chunk):
+        for name in self.columns:
+            column = chunk[name]
+            if name not in self._values:
+                self._arrays[name].append(column.to_numpy())
+                continue
+            codes, uniques = pd.factorize(column)  # Missing answers get the code -1
+            lookup = self._values[name]
+            chunk_codes = np.array([lookup.setdefault(value, len(lookup)) for value in uniques] + [-1], dtype=np.int32)
+            self._arrays[name].append(chunk_codes[codes])
+
+    # Function to build the data frame, text columns decoded into their shared values, releasing the chunks column by column
+    def to_frame(self):
+        data = {}
+        for name in self.columns:
+            arrays = self._arrays.pop(name)
+            if name not in self._values:
+                data[name] = np.concatenate(arrays) if arrays else np.array([], dtype=float)
+                continue
+            codes = np.concatenate(arrays) if arrays else np.array([], dtype=np.int32)
+            values = np.empty(len(self._values[name]) + 1, dtype=object)
+            values[:-1] = list(self._values[name])
+            values[-1] = np.nan  # Code -1
+            column = values[codes]
+            if self.types.get(name) == 'Y/N' and not (codes == -1).any():
+                column = column.astype(bool)  # Like the mapped column of a one-go load
+            data[name] = column
+        return pd.DataFrame(data, columns=self.columns, copy=False)  # The columns are fresh arrays, do not copy them again
+
+
+# Function to convert a raw survey frame to its working types
+def prepare_data(data):
+    # Convert period_col to categorical if it is numeric
+    period_name = data.columns[PERIOD_COL]
+    if pd.api.types.is_numeric_dtype(data[period_name]):
+        data[period_name] = data[period_name].astype(str)
+
+    # Transform Yes/No columns to boolean
+    boolean_cols = classify_columns(data)[0]
+    for col in boolean_cols:
+        col_name = data.columns[col]
+        data[col_name] = data[col_name].str.lower().map(YES_NO_MAP)
+    return data
+
+
+# Function to identify the type of every metric column from its declared type, or from its name without a schema
+def classify_columns(data):
+    boolean_cols = []
+    numeric_cols = []
+    single_select_cols = []
+    multi_select_cols = []
+
+    types = data.attrs.get('metric_types', {})
+    for col in range(METRICS_START, data.shape[1]):
+        col_name = data.columns[col]
+        kind = types.get(col_name)
+        if kind == 'Y/N' or kind is None and '(Y/N)' in col_name:
+            boolean_cols.append(col)
+        elif kind == 'Single Select' or kind is None and '(Single Select)' in col_name:
+            single_select_cols.append(col)
+        elif kind == 'Multi Select' or kind is None and '(Multi Select)' in col_name:
+            multi_select_cols.append(col)
+        else:
+            numeric_cols.append(col)
+    return boolean_cols, numeric_cols, single_select_cols, multi_select_cols
+
+
+# Function to apply a {column name: selected values} filter state to the data
+def apply_filters(data, filters):
+    mask = pd.Series(True, index=data.index)
+    for col_name, values in filters.items():
+        mask &= data[col_name].isin(values)
+    return data[mask]
+
+
+# Function to turn COLUMN=VALUE command line arguments into a filter state
+def parse_filters(data, items):
+    filters = {}
+    for item in items:
+        col_name, value = item.split('=', 1)
+        filters.setdefault(col_name, []).append(value)
+    # Values from the command line are strings, so compare filtered columns as strings
+    for col_name in filters:
+        data[col_name] = data[col_name].astype(str)
+    return filters
@@ -0,0 +1,95 @@
+import hashlib  # Import hashlib to turn cache keys into fixed-size identifiers
+import os  # Import os to read the configured location and size of the cache
+import pickle  # Import pickle to store DataFrames and figure JSON alike
+import sqlite3  # Import sqlite3 for a store several processes can share safely
+import threading  # Import threading for one connection per thread
+import time  # Import time to track when each entry was last used
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DISK_CACHE_DIR = os.environ.get('DASHBOARD_CACHE_DIR', os.path.join(APP_DIR, '.dashboard_cache'))
+DISK_CACHE_MB = int(os.environ.get('DASHBOARD_DISK_CACHE_MB', '1024'))  # Size cap of the cache on disk, 0 disables it
+CACHE_FORMAT = 1  # Bump when the storage of cached values changes, the entries of older deploys are then never read
+CODE_MODULES = ['app.py', 'aggregates.py', 'api.py', 'charts.py', 'dataset.py', 'export.py', 'payload.py', 'watcher.py']  # Modules that build the values of the persistent caches
+
+
+# Function to fingerprint the source of the modules that compute the cached values
+def code_fingerprint(modules=CODE_MODULES):
+    digest = hashlib.sha1()
+    for name in modules:
+        with open(os.path.join(APP_DIR, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+CODE_FINGERPRINT = code_fingerprint()  # A deploy that changes how datasets, aggregates or figures are built starts from an empty cache
+
+
+# Function to turn a cache key (a tuple of plain values) into an identifier that is the same in every process running the same code
+def key_digest(key):
+    return hashlib.sha1(repr((CACHE_FORMAT, CODE_FINGERPRINT, key)).encode()).hexdigest()
+
+
+# Size-capped cache on disk shared by all the processes of a deployment, so restarted and new instances start warm
+class DiskCache:
+    def __init__(self, directory=DISK_CACHE_DIR, budget_bytes=DISK_CACHE_MB * 1024 * 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'cache.sqlite')
+        self.budget_bytes = budget_bytes
+        self._local = threading.local()  # SQLite connections cannot be shared between threads
+        db = self._connect()
+        db.execute('PRAGMA journal_mode=WAL')  # Readers never wait for the writer of another process
+        with db:
+            db.execute('CREATE TABLE IF NOT EXISTS entries (cache TEXT, key TEXT, value BLOB, size INTEGER, cost REAL, used REAL, '
+                       'PRIMARY KEY (cache, key))')
+            db.execute('CREATE INDEX IF NOT EXISTS entries_used ON entries (used)')
+
+    def _connect(self):
+        if not hasattr(self._local, 'db'):
+            self._local.db = sqlite3.connect(self.path, timeout=30)
+        return self._local.db
+
+    # Function to get (value, seconds it took to compute) of a key, or None when it is not on disk or the disk is unavailable
+    def get(self, cache_name, key):
+        db = self._connect()
+        digest = key_digest(key)
+        try:
+            row = db.execute('SELECT value, cost FROM entries WHERE cache = ? AND key = ?', (cache_name, digest)).fetchone()
+            if row is None:
+                return None
+            try:
+                value = pickle.loads(row[0])
+            except Exception:  # Written by an incompatible version of the app
+                with db:
+                    db.execute('DELETE FROM entries WHERE cache = ? AND key = ?', (cache_name, digest))
+                return None
+            with db:
+                db.execute('UPDATE entries SET used = ? WHERE cache = ? AND key = ?', (time.time(), cache_name, digest))
+        except sqlite3.Error:  # Locked for too long by another process, or the disk is full: recompute instead
+            return None
+        return value, row[1]
+
+    # Function to store a value, evicting the least recently used entries of all processes when over the size cap
+    def put(self, cache_name, key, value, cost):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.budget_bytes:
+            return
+        db = self._connect()
+        digest = key_digest(key)
+        try:
+            # One write transaction, so two processes never evict on the basis of the same total
+            with db:
+                db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)', (cache_name, digest, blob, len(blob), cost, time.time()))
+                total = db.execute('SELECT SUM(size) FROM entries').fetchone()[0]
+                if total > self.budget_bytes:
+                    for victim_cache, victim_key, size in db.execute('SELECT cache, key, size FROM entries ORDER BY used').fetchall():
+                        if total <= self.budget_bytes:
+                            break
+                        if (victim_cache, victim_key) != (cache_name, digest):
+                            db.execute('DELETE FROM entries WHERE cache = ? AND key = ?', (victim_cache, victim_key))
+                            total -= size
+        except sqlite3.Error:  # The value is still cached in memory, it is only not shared
+            pass
+
+    # Function to get the entries and bytes held on disk per cache
+    def stats(self):
+        return self._connect().execute('SELECT cache, COUNT(*), SUM(size) FROM entries GROUP BY cache ORDER BY cache').fetchall()
@@ -0,0 +1,158 @@
+import argparse  # Import argparse for the command line interface
+import io  # Import io for in-memory downloads
+import os  # Import os for output paths
+import tempfile  # Import tempfile for staging downloads on disk
+import zipfile  # Import zipfile for bundling Parquet/CSV downloads
+
+import pandas as pd  # Import pandas for data manipulation
+
+from aggregates import compute_intervals, option_counts  # Import the shared aggregations
+from dataset import DIVISION_CANDIDATES, PERIOD_COL, apply_filters, classify_columns, load_data, parse_filters  # Import the dataset loader
+
+EXPORT_FORMATS = ['parquet', 'csv', 'excel']  # Supported export formats
+METRICS_PER_CHUNK = 20  # Number of metrics aggregated and written at a time
+
+
+# Function to yield the export tables chunk by chunk as (table name, DataFrame) pairs
+def iter_export_tables(data, division_col, filters=None, metrics_per_chunk=METRICS_PER_CHUNK, metrics=None):
+    filtered_data = apply_filters(data, filters or {})
+    period_col_name = data.columns[PERIOD_COL]
+    boolean_cols, numeric_cols, single_select_cols, multi_select_cols = classify_columns(data)
+    if metrics is not None:  # Only export the given metrics
+        boolean_cols, numeric_cols, single_select_cols, multi_select_cols = (
+            [col for col in cols if data.columns[col] in metrics]
+            for cols in (boolean_cols, numeric_cols, single_select_cols, multi_select_cols)
+        )
+    boolean_metrics = data.columns[boolean_cols].tolist()
+    numeric_metrics = data.columns[numeric_cols].tolist()
+    renames = {division_col: 'division', period_col_name: 'period'}  # Stable column names for every division choice
+
+    # Per-division/per-period aggregates and overall averages of Yes/No and numeric metrics
+    scored_metrics = boolean_metrics + numeric_metrics
+    for start in range(0, len(scored_metrics), metrics_per_chunk):
+        chunk_metrics = scored_metrics[start:start + metrics_per_chunk]
+        intervals = compute_intervals(
+            filtered_data, division_col, period_col_name,
+            [m for m in chunk_metrics if m in boolean_metrics],
+            [m for m in chunk_metrics if m in numeric_metrics]
+        ).rename(columns=renames)
+        intervals['period'] = intervals['period'].astype(str)
+        yield 'aggregates', intervals[['metric', 'division', 'period', 'mean', 'count', 'lower', 'upper', 'significant']]
+
+        values = filtered_data[chunk_metrics].astype(float)
+        grouped = values.groupby(filtered_data[period_col_name])
+        overall = pd.concat({'mean': grouped.mean().stack(future_stack=True), 'count': grouped.count().stack(future_stack=True)}, axis=1)
+        overall = overall.rename_axis(['period', 'metric']).reset_index()
+        overall['period'] = overall['period'].astype(str)
+        yield 'overall', overall[['metric', 'period', 'mean', 'count']]
+
+    # Option distributions of single and multi select metrics, including the overall distribution
+    for col in single_select_cols + multi_select_cols:
+        metric = data.columns[col]
+        counts = option_counts(filtered_data, division_col, period_col_name, metric, multi_select=col in multi_select_cols)
+        overall = counts.groupby(level=period_col_name).sum()
+        overall.index = pd.MultiIndex.from_product([['Overall Average'], overall.index], names=counts.index.names)
+        counts = pd.concat([overall, counts])
+
+        percentage = counts.div(counts.sum(axis=1), axis=0) * 100
+        distribution = pd.concat({'count': counts.stack(future_stack=True), 'percentage': percentage.stack(future_stack=True)}, axis=1)
+        distribution = distribution.rename_axis(['division', 'period', 'option']).reset_index()
+        distribution = distribution[distribution['count'] > 0]  # Options nobody picked in that division and period
+        distribution.insert(0, 'metric', metric)
+        distribution['period'] = distribution['period'].astype(str)
+        distribution['option'] = distribution['option'].astype(str)
+        yield 'options', distribution
+
+
+# Function to write the export tables as one Parquet file per table in the output directory
+def write_parquet(tables, output_dir):
+    import pyarrow as pa  # Optional dependency, only needed for Parquet exports
+    import pyarrow.parquet as pq
+
+    os.makedirs(output_dir, exist_ok=True)
+    writers = {}
+    try:
+        for name, chunk in tables:
+            if name not in writers:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writers[name] = pq.ParquetWriter(os.path.join(output_dir, f"{name}.parquet"), schema)
+            writer = writers[name]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False))  # One row group per chunk
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+
+# Function to write the export tables as one CSV file per table in the output directory
+def write_csv(tables, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    started = set()
+    for name, chunk in tables:
+        path = os.path.join(output_dir, f"{name}.csv")
+        chunk.to_csv(path, mode='a' if name in started else 'w', header=name not in started, index=False)  # Append after the first chunk
+        started.add(name)
+
+
+# Function to write the export tables as one sheet per table of an Excel workbook
+def write_excel(tables, output_path):
+    from openpyxl import Workbook  # Optional dependency, only needed for Excel exports
+
+    workbook = Workbook(write_only=True)  # Write-only mode streams rows to disk instead of keeping cells in memory
+    sheets = {}
+    for name, chunk in tables:
+        if name not in sheets:
+            sheets[name] = workbook.create_sheet(title=name)
+            sheets[name].append(chunk.columns.tolist())
+        chunk = chunk.astype(object).where(chunk.notna(), None)  # Empty cells instead of NaN
+        for row in chunk.itertuples(index=False):
+            sheets[name].append(list(row))
+    workbook.save(output_path)
+
+
+# Function to export every metric for a filter state in the requested format
+def export_aggregates(data, division_col, output, export_format='excel', filters=None, metrics_per_chunk=METRICS_PER_CHUNK):
+    tables = iter_export_tables(data, division_col, filters, metrics_per_chunk)
+    if export_format == 'parquet':
+        write_parquet(tables, output)
+    elif export_format == 'csv':
+        write_csv(tables, output)
+    elif export_format == 'excel':
+        write_excel(tables, output)
+    else:
+        raise ValueError(f"Unknown export format: {export_format}")
+
+
+# Function to export every metric for a filter state into an in-memory file for download
+def export_to_bytes(data, division_col, export_format='excel', filters=None):
+    with tempfile.TemporaryDirectory() as staging_dir:
+        if export_format == 'excel':
+            output = os.path.join(staging_dir, 'export.xlsx')
+            export_aggregates(data, division_col, output, export_format, filters)
+            with open(output, 'rb') as f:
+                return 'dashboard_export.xlsx', f.read()
+
+        # Parquet and CSV exports are one file per table, so bundle them in a zip archive
+        export_aggregates(data, division_col, staging_dir, export_format, filters)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name in sorted(os.listdir(staging_dir)):
+                archive.write(os.path.join(staging_dir, name), arcname=name)
+        return f'dashboard_export_{export_format}.zip', buffer.getvalue()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the aggregates behind every chart of the dashboard")
+    parser.add_argument('output', help="Excel file, or directory for Parquet/CSV exports")
+    parser.add_argument('--data', default='data_cleaned_dummy.xlsx', help="Survey workbook")
+    parser.add_argument('--division-col', help="Division column name (defaults to the first candidate)")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, help="Defaults to excel for .xlsx outputs, parquet otherwise")
+    parser.add_argument('--filter', action='append', default=[], metavar='COLUMN=VALUE',
+                        help="Keep rows whose COLUMN equals VALUE, can be repeated")
+    args = parser.parse_args()
+
+    data = load_data(args.data)
+    filters = parse_filters(data, args.filter)
+
+    export_format = args.format or ('excel' if args.output.endswith('.xlsx') else 'parquet')
+    division_col = args.division_col or data.columns[DIVISION_CANDIDATES[0]]
+    export_aggregates(data, division_col, args.output, export_format, filters)
@@ -0,0 +1,79 @@
+import threading  # Import threading to share the payload statistics between sessions
+
+import numpy as np  # Import NumPy for rounding trace data
+import pandas as pd  # Import pandas for the statistics table
+
+PAYLOAD_DECIMALS = 4  # Decimals kept in trace data, enough for the 2-decimal percentages shown in hovers
+PERCENT_DECIMALS = 2  # Decimals kept in the percentages of select charts, which are shown with one decimal
+ARRAY_PROPERTIES = ['x', 'y', 'base', 'customdata']  # Per-point trace properties that carry numbers
+ERROR_PROPERTIES = ['error_x', 'error_y']  # Error bars, whose array and arrayminus carry numbers
+PAYLOAD_SAMPLE_EVERY = 20  # Figures of a chart compacted per figure measured, measuring serializes the figure twice
+
+
+# Function to round a float array to a number of decimals, other values are returned unchanged
+def round_array(values, decimals=PAYLOAD_DECIMALS):
+    if values is None or isinstance(values, str):
+        return values
+    array = np.asarray(values)
+    if array.dtype.kind == 'O' and array.ndim == 2:
+        # Hover data mixes labels and numbers, round column by column
+        return np.column_stack([round_array(array[:, i], decimals) for i in range(array.shape[1])])
+    if array.dtype.kind == 'O' and array.ndim == 1 and all(isinstance(v, (float, np.floating)) for v in array):
+        array = array.astype(float)  # Properties such as the base of bars are stored as objects
+    if array.dtype.kind == 'f':
+        return np.round(array, decimals)
+    return values
+
+
+# Function to make the JSON of a figure smaller without changing what is drawn
+def compact_figure(fig, decimals=PAYLOAD_DECIMALS):
+    # Full precision floats are most of the payload, the charts never show more than a few decimals
+    for trace in fig.data:
+        for prop in ARRAY_PROPERTIES:
+            if prop in trace and trace[prop] is not None:
+                trace[prop] = round_array(trace[prop], decimals)
+        for prop in ERROR_PROPERTIES:
+            if prop in trace and trace[prop].array is not None:
+                trace[prop].array = round_array(trace[prop].array, decimals)
+                if trace[prop].arrayminus is not None:
+                    trace[prop].arrayminus = round_array(trace[prop].arrayminus, decimals)
+
+    # Every figure carries the whole default template, only keep the trace defaults of the trace types it uses
+    template = fig.layout.template
+    used = {trace.type for trace in fig.data}
+    fig.layout.template.data = {trace_type: getattr(template.data, trace_type) for trace_type in used if getattr(template.data, trace_type, None)}
+    return fig
+
+
+# Bytes sent to the browser per chart, before and after compact_figure, measured on a sample of the figures
+class PayloadMeter:
+    def __init__(self, sample_every=PAYLOAD_SAMPLE_EVERY):
+        self.sample_every = sample_every  # 1 measures every figure
+        self._stats = {}  # Chart name -> [figures compacted, figures measured, bytes before, bytes after]
+        self._lock = threading.Lock()
+
+    # Function to compact a figure and, for the first of every sample_every figures of a chart, record its JSON size before and after
+    def compact(self, chart_name, fig, decimals=PAYLOAD_DECIMALS):
+        with self._lock:
+            stats = self._stats.setdefault(chart_name, [0, 0, 0, 0])
+            measured = stats[0] % self.sample_every == 0
+            stats[0] += 1
+        if not measured:
+            return compact_figure(fig, decimals)  # Charts rebuilt on every rerun are not serialized for the meter
+
+        before = len(fig.to_json())
+        compact_figure(fig, decimals)
+        after = len(fig.to_json())
+        with self._lock:
+            stats[1] += 1
+            stats[2] += before
+            stats[3] += after
+        return fig
+
+    # Function to get the average payload per chart as a table
+    def stats(self):
+        with self._lock:
+            rows = [{'chart': chart_name, 'figures': figures, 'measured': measured, 'KB before': before / measured / 1024,
+                     'KB after': after / measured / 1024, 'saved': 1 - after / before}
+                    for chart_name, (figures, measured, before, after) in sorted(self._stats.items()) if measured]
+        return pd.DataFrame(rows, columns=['chart', 'figures', 'measured', 'KB before', 'KB after', 'saved'])
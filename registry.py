@@ -0,0 +1,115 @@
+import os  # Import os to list the survey workbooks
+import threading  # Import threading to share the datasets between sessions
+import time  # Import time to track when each dataset was last used
+from concurrent.futures import ThreadPoolExecutor  # Import the thread pool that loads datasets in the background
+
+from cache_manager import sizeof  # Import the size accounting of cached values
+from dataset import read_columns  # Import the header reader
+from watcher import DatasetWatcher  # Import the background watcher that loads and hot-reloads a workbook
+
+DATASET_EXTENSIONS = ('.xlsx', '.csv')  # Files served as datasets when a directory is configured
+DEFAULT_DATASET_BUDGET_MB = int(os.environ.get('DASHBOARD_DATASET_BUDGET_MB', '1024'))  # Memory budget of the loaded datasets
+
+
+# Function to find the survey workbooks to serve as {dataset name: path} from a workbook or a directory of workbooks
+def discover_datasets(path):
+    if not os.path.isdir(path):
+        return {os.path.splitext(os.path.basename(path))[0]: path}
+    return {
+        os.path.splitext(name)[0]: os.path.join(path, name)
+        for name in sorted(os.listdir(path))
+        if name.endswith(DATASET_EXTENSIONS) and not name.startswith('~$')  # Skip the lock files of open workbooks
+    }
+
+
+# Function to estimate the memory held by a dataset version, its data and its indexes and default aggregates
+def dataset_size(version):
+    return (sizeof(version.data) + sizeof(version.values) + sizeof(version.codes) + sizeof(version.row_index) +
+            sizeof(version.answer_bits) + sizeof(version.default_intervals))
+
+
+# Datasets served by one instance, each loaded in the background on first access and evicted when idle under memory pressure
+class DatasetRegistry:
+    def __init__(self, paths, budget_bytes=DEFAULT_DATASET_BUDGET_MB * 1024 * 1024, disk_cache=None):
+        self.paths = paths  # Dataset name -> workbook path
+        self.budget_bytes = budget_bytes
+        self.disk_cache = disk_cache  # Optional DiskCache of the typed datasets and their default aggregates
+        self._loads = {}  # Dataset name -> future of the watcher of the loading and loaded datasets
+        self._watchers = {}  # Dataset name -> watcher of the loaded datasets
+        self._progress = {}  # Dataset name -> (fraction, stage) of the load in progress
+        self._columns = {}  # Dataset name -> column names read from the workbook header
+        self._last_used = {}  # Dataset name -> time of the last access
+        self._executor = ThreadPoolExecutor(thread_name_prefix='dataset-loader')
+        self._lock = threading.Lock()
+
+    # Function to list the names of the datasets that can be served
+    def names(self):
+        return list(self.paths)
+
+    # Function to start loading a dataset in the background if needed, returning the future of its watcher
+    def load(self, name):
+        with self._lock:
+            self._last_used[name] = time.monotonic()
+            if name not in self._loads:
+                self._progress[name] = (0.0, "Waiting to be loaded")
+                self._loads[name] = self._executor.submit(self._load, name)
+            return self._loads[name]
+
+    # Function to get the latest complete version of a dataset, waiting for it to be loaded on first access
+    def get(self, name):
+        return self.load(name).result().current()
+
+    # Function to get the (fraction, stage) of the load of a dataset
+    def progress(self, name):
+        return self._progress.get(name, (0.0, "Waiting to be loaded"))
+
+    # Function to get the column names of a dataset without waiting for it to be loaded
+    def columns(self, name):
+        future = self.load(name)
+        if future.done() and future.exception() is None:
+            return future.result().current().data.columns
+        if name not in self._columns:
+            self._columns[name] = read_columns(self.paths[name])  # Only the header row is read
+        return self._columns[name]
+
+    def _load(self, name):
+        def report(fraction, stage):
+            self._progress[name] = (fraction, stage)
+
+        try:
+            # A reload can make a dataset larger, so the budget is checked again after every swap
+            watcher = DatasetWatcher(self.paths[name], progress=report, disk_cache=self.disk_cache, on_swap=self._evict).start()
+        except Exception:
+            with self._lock:
+                del self._loads[name]  # Let the next access try again
+            raise
+        with self._lock:
+            self._watchers[name] = watcher
+        self._evict(keep=name)
+        return watcher
+
+    # Function to stop and drop the least recently used datasets until the loaded ones fit the budget,
+    # never the one to keep (by default the most recently used)
+    def _evict(self, keep=None):
+        with self._lock:
+            sizes = {name: dataset_size(watcher.current()) for name, watcher in self._watchers.items()}
+            keep = keep or max(sizes, key=lambda name: self._last_used[name], default=None)
+            while sum(sizes.values()) > self.budget_bytes and len(sizes) > 1:
+                victim = min((name for name in sizes if name != keep), key=lambda name: self._last_used[name])
+                self._watchers.pop(victim).stop()  # Sessions still holding its version keep it until their rerun ends
+                del self._loads[victim]
+                del sizes[victim]
+
+    # Function to describe the datasets for the debug view
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    'dataset': name,
+                    'loaded': name in self._watchers,
+                    'bytes held': dataset_size(self._watchers[name].current()) if name in self._watchers else 0,
+                    'idle seconds': now - self._last_used[name] if name in self._last_used else float('nan'),
+                }
+                for name in self.paths
+            ]
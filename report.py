@@ -0,0 +1,82 @@
+import argparse  # Import argparse for the command line interface
+import html  # Import html for escaping titles
+import os  # Import os for the number of workers
+from concurrent.futures import ProcessPoolExecutor  # Import the process pool for building figures in parallel
+
+import plotly.io as pio  # Import Plotly IO for rendering figures to HTML
+from plotly.offline import get_plotlyjs  # Import the Plotly JS bundle that is embedded once
+
+from aggregates import compute_intervals, division_scores, option_counts  # Import the shared aggregations
+from charts import TOP_K_OPTIONS, build_score_chart, build_select_chart  # Import the shared chart builders
+from dataset import DIVISION_CANDIDATES, METRICS_START, PERIOD_COL, apply_filters, classify_columns, load_data, parse_filters  # Import the dataset loader
+
+# State of each worker process, set once by init_worker instead of being sent with every task
+_worker = {}
+
+
+# Function to give a worker process the filtered data and intervals it builds figures from
+def init_worker(filtered_data, intervals, division_col, top_k):
+    _worker['data'] = filtered_data
+    _worker['intervals'] = intervals
+    _worker['division_col'] = division_col
+    _worker['top_k'] = top_k
+    _worker['types'] = classify_columns(filtered_data)
+
+
+# Function to build the figure of one metric and render it as an HTML fragment without the Plotly JS
+def render_metric(metric):
+    filtered_data = _worker['data']
+    division_col = _worker['division_col']
+    period_col_name = filtered_data.columns[PERIOD_COL]
+    boolean_cols, numeric_cols, single_select_cols, multi_select_cols = _worker['types']
+    col = filtered_data.columns.get_loc(metric)
+
+    if col in single_select_cols or col in multi_select_cols:
+        counts = option_counts(filtered_data, division_col, period_col_name, metric, multi_select=col in multi_select_cols)
+        fig = build_select_chart(counts, division_col, period_col_name, metric, _worker['top_k'])
+    else:
+        average_metrics, overall_avg = division_scores(_worker['intervals'], division_col, period_col_name, metric)
+        fig = build_score_chart(average_metrics, overall_avg, division_col, period_col_name, metric, boolean=col in boolean_cols)
+    return pio.to_html(fig, include_plotlyjs=False, full_html=False)
+
+
+# Function to write a self-contained HTML report with the figure of every metric
+def build_report(data, division_col, output_path, filters=None, workers=None, top_k=TOP_K_OPTIONS):
+    filtered_data = apply_filters(data, filters or {})
+    boolean_cols, numeric_cols = classify_columns(data)[:2]
+    intervals = compute_intervals(filtered_data, division_col, data.columns[PERIOD_COL],
+                                  data.columns[boolean_cols], data.columns[numeric_cols])  # One pass for all metrics
+    metrics_options = data.columns[METRICS_START:].tolist()
+    filter_text = '; '.join(f"{col}: {', '.join(map(str, values))}" for col, values in (filters or {}).items()) or 'none'
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        # Embed the Plotly JS once in the head, every figure below reuses it
+        f.write('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>Dashboard report</title>\n')
+        f.write(f'<script type="text/javascript">{get_plotlyjs()}</script>\n</head>\n<body>\n')
+        f.write(f'<h1>Performance by {html.escape(division_col)}</h1>\n<p>Filters: {html.escape(filter_text)}</p>\n')
+
+        # Build the figures in a process pool and write them in metric order as they complete
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(filtered_data, intervals, division_col, top_k)) as executor:
+            chunksize = max(1, len(metrics_options) // ((workers or os.cpu_count() or 1) * 4))
+            for fragment in executor.map(render_metric, metrics_options, chunksize=chunksize):
+                f.write(f'<div class="chart">{fragment}</div>\n')
+
+        f.write('</body>\n</html>\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a static HTML report with the chart of every metric")
+    parser.add_argument('output', help="Output HTML file")
+    parser.add_argument('--data', default='data_cleaned_dummy.xlsx', help="Survey workbook")
+    parser.add_argument('--division-col', help="Division column name (defaults to the first candidate)")
+    parser.add_argument('--filter', action='append', default=[], metavar='COLUMN=VALUE',
+                        help="Keep rows whose COLUMN equals VALUE, can be repeated")
+    parser.add_argument('--workers', type=int, help="Number of worker processes (defaults to the number of CPUs)")
+    parser.add_argument('--top-k', type=int, default=TOP_K_OPTIONS, help="Options shown in select questions")
+    args = parser.parse_args()
+
+    data = load_data(args.data)
+    filters = parse_filters(data, args.filter)
+    division_col = args.division_col or data.columns[DIVISION_CANDIDATES[0]]
+    build_report(data, division_col, args.output, filters, args.workers, args.top_k)
@@ -0,0 +1,4 @@
+import os  # Import os to locate the application modules
+import sys  # Import sys to extend the module search path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Make app modules importable
@@ -0,0 +1,145 @@
+import math  # Import math for the reference intervals
+
+import numpy as np  # Import NumPy for random survey answers
+import pandas as pd  # Import pandas for the survey frames
+import pytest  # Import pytest for approximate comparisons
+
+from aggregates import compare_segments, compute_intervals, option_counts, rollup_children, rollup_levels, rollup_node, stack_segments
+
+T_975 = {4: 2.776445, 9: 2.262157, 29: 2.045230}  # Two-sided 95% Student t critical values per degrees of freedom
+Z_975 = 1.959964  # Two-sided 95% normal critical value
+
+
+# Function to build a survey with groups of 5, 10 and 30 responses per division and period, so the degrees of freedom are known
+def make_groups(seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for division, size in [('D1', 5), ('D2', 10), ('D3', 30)]:
+        for period in ['2023', '2024']:
+            for _ in range(size):
+                rows.append({'Division': division, 'Period': period,
+                             'Score': float(rng.integers(1, 12)), 'Agree (Y/N)': bool(rng.random() < 0.6)})
+    return pd.DataFrame(rows)
+
+
+# Function to compute the Wilson score interval of one group the textbook way
+def wilson(p, n, z=Z_975):
+    centre = (p + z**2 / (2 * n)) / (1 + z**2 / n)
+    spread = z * math.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / (1 + z**2 / n)
+    return centre - spread, centre + spread
+
+
+# Check the means, counts and both kinds of intervals against a naive groupby per division and period
+def test_compute_intervals_matches_naive_groupby():
+    data = make_groups()
+    intervals = compute_intervals(data, 'Division', 'Period', ['Agree (Y/N)'], ['Score']).set_index(['Division', 'Period', 'metric'])
+
+    for (division, period), group in data.groupby(['Division', 'Period']):
+        n = len(group)
+        score = intervals.loc[(division, period, 'Score')]
+        margin = T_975[n - 1] * group['Score'].std(ddof=1) / math.sqrt(n)
+        assert score['count'] == n
+        assert score['mean'] == pytest.approx(group['Score'].mean())
+        assert score['lower'] == pytest.approx(group['Score'].mean() - margin, rel=1e-4)
+        assert score['upper'] == pytest.approx(group['Score'].mean() + margin, rel=1e-4)
+
+        agree = intervals.loc[(division, period, 'Agree (Y/N)')]
+        p = group['Agree (Y/N)'].mean()
+        assert agree['mean'] == pytest.approx(p)
+        assert (agree['lower'], agree['upper']) == pytest.approx(wilson(p, n), rel=1e-5)
+
+
+# Check the significance flags against the overall average of each period
+def test_compute_intervals_flags_divisions_whose_interval_excludes_the_average():
+    data = make_groups()
+    data.loc[data['Division'] == 'D3', 'Score'] = 11.0  # One division far above the others
+    intervals = compute_intervals(data, 'Division', 'Period', [], ['Score'])
+
+    overall = data.groupby('Period')['Score'].mean()
+    assert intervals['overall_avg'].to_numpy() == pytest.approx(overall.loc[intervals['Period']].to_numpy())
+    expected = (intervals['lower'] > intervals['overall_avg']) | (intervals['upper'] < intervals['overall_avg'])
+    assert intervals['significant'].tolist() == expected.tolist()
+    assert intervals.loc[intervals['Division'] == 'D3', 'significant'].all()
+
+
+# Check that missing answers are left out of the counts and means, and that a group without answers has no interval
+def test_compute_intervals_skips_missing_answers():
+    data = make_groups()
+    data.loc[data.index[:3], 'Score'] = np.nan  # Three of the five 2023 answers of D1
+    data.loc[(data['Division'] == 'D2') & (data['Period'] == '2024'), 'Score'] = np.nan
+    intervals = compute_intervals(data, 'Division', 'Period', [], ['Score']).set_index(['Division', 'Period'])
+
+    assert intervals.loc[('D1', '2023'), 'count'] == 2
+    assert intervals.loc[('D1', '2023'), 'mean'] == pytest.approx(data['Score'].iloc[3:5].mean())
+    assert intervals.loc[('D2', '2024'), 'count'] == 0
+    assert np.isnan(intervals.loc[('D2', '2024'), ['mean', 'lower', 'upper']].astype(float)).all()
+
+
+# Function to build a three-level hierarchy of divisions and features with some unanswered questions
+def make_hierarchy(seed=0):
+    rng = np.random.default_rng(seed)
+    n = 400
+    data = pd.DataFrame({
+        'Division': rng.choice(['D1', 'D2', 'D3'], n),
+        'Feature 1': rng.choice(['A', 'B'], n),
+        'Feature 2': rng.choice(['x', 'y', 'z'], n),
+        'Score': rng.integers(1, 12, n).astype(float),
+        'Agree (Y/N)': (rng.random(n) < 0.5).astype(float),
+    })
+    data.loc[rng.random(n) < 0.2, 'Score'] = np.nan
+    return data
+
+
+# Check every node and its children in the rollup against a naive mean over the rows of its path
+def test_rollup_matches_naive_mean():
+    data = make_hierarchy()
+    level_cols = ['Division', 'Feature 1', 'Feature 2']
+    metrics = ['Score', 'Agree (Y/N)']
+    levels = rollup_levels(data, level_cols, metrics)
+
+    for depth in range(1, len(level_cols) + 1):
+        for path, group in data.groupby(level_cols[:depth]):
+            means, counts = rollup_node(levels, path)
+            for metric in metrics:
+                assert means[metric] == pytest.approx(group[metric].mean())
+                assert counts[metric] == group[metric].notna().sum()
+
+            if depth < len(level_cols):
+                children_avg, children_count = rollup_children(levels, path, 'Score')
+                expected = group.groupby(level_cols[depth])['Score']
+                assert children_avg.to_dict() == pytest.approx(expected.mean().to_dict())
+                assert children_count.to_dict() == expected.count().to_dict()
+                responses, _ = rollup_children(levels, path)
+                assert responses.to_dict() == group.groupby(level_cols[depth]).size().to_dict()
+
+
+# Function to build a survey with select answers and two overlapping segments, all rows and the 2024 rows
+def make_segments(seed=0):
+    data = make_groups(seed)
+    rng = np.random.default_rng(seed)
+    data['Channel (Single Select)'] = rng.choice(['x', 'y', 'Other'], len(data))
+    data['Topics (Multi Select)'] = [' | '.join(rng.choice(['x', 'y', 'z'], size=rng.integers(1, 3), replace=False)) for _ in range(len(data))]
+    data.index = data.index * 10  # Labels that are not row positions
+    masks = {'A': np.ones(len(data), dtype=bool), 'B': (data['Period'] == '2024').to_numpy()}
+    return data, masks
+
+
+# Check that rows in both segments are counted once in each segment, for the intervals and the option counts
+@pytest.mark.parametrize('metric, multi_select', [('Channel (Single Select)', False), ('Topics (Multi Select)', True)])
+def test_overlapping_segments_count_shared_rows_once_per_segment(metric, multi_select):
+    data, masks = make_segments()
+    counts = option_counts(stack_segments(data, masks, ['Division', metric]), 'Division', 'segment', metric, multi_select=multi_select)
+
+    for segment, mask in masks.items():
+        answers = data.loc[mask, ['Division', metric]]
+        if multi_select:
+            answers = answers.assign(**{metric: answers[metric].str.split(' | ', regex=False)}).explode(metric)
+        expected = answers.groupby(['Division', metric]).size()
+        for (division, option), count in expected.items():
+            assert counts.loc[(division, segment), option] == count
+
+    intervals = compare_segments(data, masks, 'Division', ['Agree (Y/N)'], ['Score']).set_index(['Division', 'segment', 'metric'])
+    for segment, mask in masks.items():
+        for division, group in data[mask].groupby('Division'):
+            assert intervals.loc[(division, segment, 'Score'), 'count'] == len(group)
+            assert intervals.loc[(division, segment, 'Score'), 'mean'] == pytest.approx(group['Score'].mean())
@@ -0,0 +1,43 @@
+import numpy as np  # Import NumPy for random survey answers
+import pandas as pd  # Import pandas for the survey frames
+
+from aggregates import compute_intervals, division_scores
+from charts import OTHER_LABEL, PERIOD_COLORS, build_score_chart, fold_options
+
+
+# Check that every period gets its trace and average line when there are more periods than colors
+def test_score_chart_draws_every_period():
+    rng = np.random.default_rng(0)
+    periods = ['2022', '2023', '2024']
+    data = pd.DataFrame({
+        'Division': rng.choice(['D1', 'D2', 'D3'], 300),
+        'Period': rng.choice(periods, 300),
+        'Score': rng.integers(1, 12, 300).astype(float),
+    })
+    average_metrics, overall_avg = division_scores(compute_intervals(data, 'Division', 'Period', [], ['Score']),
+                                                   'Division', 'Period', 'Score')
+    fig = build_score_chart(average_metrics, overall_avg, 'Division', 'Period', 'Score')
+
+    traces = [trace for trace in fig.data if trace.name in periods]
+    assert sorted(trace.name for trace in traces) == periods
+    assert len(fig.layout.shapes) == len(periods)
+    assert {trace.marker.color for trace in traces} == set(PERIOD_COLORS)
+
+
+# Check that the options outside the top K are folded into "Other" without losing answers, also when "Other" is a real answer
+def test_fold_options_keeps_every_answer():
+    counts = pd.DataFrame({'a': [30, 20], 'b': [10, 5], 'c': [2, 1], 'd': [1, 1]}, index=['D1', 'D2'])
+    folded = fold_options(counts, top_k=2)
+    assert folded.columns.tolist() == ['a', 'b', OTHER_LABEL]
+    assert folded[OTHER_LABEL].tolist() == [3, 2]
+
+    counts[OTHER_LABEL] = [25, 15]  # Among the top 2
+    folded = fold_options(counts, top_k=2)
+    assert folded.columns.tolist() == ['a', OTHER_LABEL]
+    assert folded[OTHER_LABEL].tolist() == [25 + 13, 15 + 7]
+    assert folded.sum(axis=1).tolist() == counts.sum(axis=1).tolist()
+
+    counts[OTHER_LABEL] = [0, 1]  # Folded with the tail
+    folded = fold_options(counts, top_k=2)
+    assert folded[OTHER_LABEL].tolist() == [3, 3]
+    assert fold_options(counts, top_k=10).equals(counts[['a', 'b', 'c', 'd', OTHER_LABEL]])
@@ -0,0 +1,107 @@
+import json  # Import json to write schema manifests
+import re  # Import re to match error messages literally
+
+import pandas as pd  # Import pandas for the survey frames
+import pytest  # Import pytest for the expected errors
+
+from dataset import SchemaError, check_answers, load_data, read_schema
+
+
+# Function to build a valid manifest with one metric of every type
+def make_schema():
+    return {'columns': [
+        {'name': 'Programme', 'role': 'division'},
+        {'name': 'Year', 'role': 'period'},
+        {'name': 'Department', 'role': 'division'},
+        {'name': 'Campus', 'role': 'division'},
+        {'name': 'Score', 'role': 'metric', 'type': 'numeric'},
+        {'name': 'Agree', 'role': 'metric', 'type': 'Y/N'},
+        {'name': 'Channel', 'role': 'metric', 'type': 'Single Select', 'options': ['Email', 'Phone']},
+        {'name': 'Topics', 'role': 'metric', 'type': 'Multi Select', 'options': ['Fees', 'Housing', 'Library']},
+    ]}
+
+
+# Function to build answers that follow the manifest, some of them missing
+def make_answers():
+    return pd.DataFrame({
+        'Programme': ['P1', 'P2', 'P1'],
+        'Year': ['2023', '2024', '2024'],
+        'Department': ['D1', 'D1', 'D2'],
+        'Campus': ['London', 'Edinburgh', 'London'],
+        'Score': [7.0, None, 3.0],
+        'Agree': ['Yes', 'n', None],
+        'Channel': ['Email', 'Phone', None],
+        'Topics': ['Fees | Housing', 'Library', None],
+    })
+
+
+# Function to write a manifest next to a workbook path and return that path
+def write_schema(tmp_path, schema, name='survey.csv'):
+    (tmp_path / name.replace('.csv', '.schema.json')).write_text(json.dumps(schema), encoding='utf-8')
+    return str(tmp_path / name)
+
+
+# Check that answers following the manifest are accepted
+def test_check_answers_accepts_declared_answers():
+    check_answers(make_answers(), make_schema())
+
+
+# Check that an answer outside the declared options of a Y/N or select metric is reported with its column
+@pytest.mark.parametrize('column, value, message', [
+    ('Agree', 'Maybe', "Agree: unexpected answers ['maybe']"),  # Y/N answers are compared lowercased
+    ('Channel', 'Post', "Channel: unexpected answers ['Post']"),
+    ('Topics', 'Fees | Sport', "Topics: unexpected answers ['Sport']"),
+])
+def test_check_answers_rejects_undeclared_answers(column, value, message):
+    data = make_answers()
+    data.loc[0, column] = value
+    with pytest.raises(SchemaError, match=re.escape(message)):
+        check_answers(data, make_schema())
+
+
+# Check that select metrics without declared options accept any answer
+def test_check_answers_without_options_accepts_anything():
+    schema = make_schema()
+    del schema['columns'][6]['options']
+    data = make_answers()
+    data.loc[0, 'Channel'] = 'Post'
+    check_answers(data, schema)
+
+
+# Check that a workbook without a manifest has no schema, and that a valid manifest is read as written
+def test_read_schema(tmp_path):
+    assert read_schema(str(tmp_path / 'survey.csv')) is None
+    assert read_schema(write_schema(tmp_path, make_schema())) == make_schema()
+
+
+# Check that every kind of invalid manifest is rejected with a message naming the problem
+@pytest.mark.parametrize('change, message', [
+    (lambda columns: columns.pop(3), "3 division column"),
+    (lambda columns: columns[1].update(role='division'), "1 period column"),
+    (lambda columns: columns[4].update(role='answer'), "Score: unknown role answer"),
+    (lambda columns: columns[5].update(type='boolean'), "Agree: type must be one of"),
+    (lambda columns: columns[7].update(name='Agree'), "column names must be unique"),
+    (lambda columns: [columns.pop() for _ in range(4)], "no metric column declared"),
+])
+def test_read_schema_rejects_invalid_manifests(tmp_path, change, message):
+    schema = make_schema()
+    change(schema['columns'])
+    with pytest.raises(SchemaError, match=message):
+        read_schema(write_schema(tmp_path, schema))
+
+
+# Check that an export is loaded with the declared types, and rejected when one of its chunks has an undeclared answer
+def test_load_data_follows_the_manifest(tmp_path):
+    file_path = write_schema(tmp_path, make_schema())
+    make_answers().to_csv(file_path, index=False)
+    data = load_data(file_path)
+    assert data['Year'].tolist() == ['2023', '2024', '2024']
+    assert data['Agree'].tolist()[:2] == [True, False]
+    assert data['Topics'].tolist()[0] == 'Fees | Housing'
+    assert data.attrs['metric_types']['Channel'] == 'Single Select'
+
+    answers = make_answers()
+    answers.loc[2, 'Channel'] = 'Post'
+    answers.to_csv(file_path, index=False)
+    with pytest.raises(SchemaError, match="Channel"):
+        load_data(file_path)
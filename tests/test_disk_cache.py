@@ -0,0 +1,73 @@
+import itertools  # Import itertools for a clock that always moves forward
+import pickle  # Import pickle to size the stored values
+import sqlite3  # Import sqlite3 to corrupt an entry behind the cache's back
+import types  # Import types for the fake clock
+
+import pandas as pd  # Import pandas for a DataFrame value
+
+import disk_cache
+from disk_cache import DiskCache
+
+BUDGET_BYTES = 1 << 20  # Size cap of the caches under test, independent of DASHBOARD_DISK_CACHE_MB
+
+
+# Function to replace the clock of the cache with one that ticks once per call, so the least recently used entry is well defined
+def tick_clock(monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(disk_cache, 'time', types.SimpleNamespace(time=lambda: float(next(clock))))
+
+
+# Check that stored values come back with their cost, per cache name, and that unknown keys are misses
+def test_put_and_get_roundtrip(tmp_path):
+    cache = DiskCache(str(tmp_path), BUDGET_BYTES)
+    frame = pd.DataFrame({'Division': ['D1', 'D2'], 'mean': [0.5, 7.25]})
+    cache.put('intervals', ('v1', 'Division'), frame, 1.5)
+
+    value, cost = cache.get('intervals', ('v1', 'Division'))
+    pd.testing.assert_frame_equal(value, frame)
+    assert cost == 1.5
+    assert cache.get('intervals', ('v2', 'Division')) is None
+    assert cache.get('figures', ('v1', 'Division')) is None
+    assert cache.stats() == [('intervals', 1, len(pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)))]
+
+
+# Check that the values are shared with another instance opened on the same directory, like another process
+def test_entries_are_shared_between_instances(tmp_path):
+    DiskCache(str(tmp_path), BUDGET_BYTES).put('figures', 'key', {'data': [1, 2, 3]}, 0.25)
+    assert DiskCache(str(tmp_path), BUDGET_BYTES).get('figures', 'key') == ({'data': [1, 2, 3]}, 0.25)
+
+
+# Check that going over the size cap evicts the least recently used entries, counting reads as uses
+def test_eviction_over_budget_drops_least_recently_used(tmp_path, monkeypatch):
+    tick_clock(monkeypatch)
+    value = b'x' * 1000
+    size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = DiskCache(str(tmp_path), budget_bytes=3 * size)
+    for key in ['a', 'b', 'c']:
+        cache.put('blobs', key, value, 0.1)
+    cache.get('blobs', 'a')  # 'b' is now the least recently used
+
+    cache.put('blobs', 'd', value, 0.1)
+    assert cache.get('blobs', 'b') is None
+    assert all(cache.get('blobs', key) is not None for key in ['a', 'c', 'd'])
+    assert cache.stats() == [('blobs', 3, 3 * size)]
+
+
+# Check that a value larger than the whole cache is not stored and does not evict anything
+def test_value_larger_than_budget_is_skipped(tmp_path):
+    cache = DiskCache(str(tmp_path), budget_bytes=2000)
+    cache.put('blobs', 'small', b'x' * 100, 0.1)
+    cache.put('blobs', 'large', b'x' * 5000, 0.1)
+    assert cache.get('blobs', 'large') is None
+    assert cache.get('blobs', 'small') is not None
+
+
+# Check that an entry that cannot be unpickled is a miss and is deleted
+def test_corrupt_entry_is_deleted(tmp_path):
+    cache = DiskCache(str(tmp_path), BUDGET_BYTES)
+    cache.put('blobs', 'key', [1, 2, 3], 0.1)
+    with sqlite3.connect(cache.path) as db:
+        db.execute('UPDATE entries SET value = ?', (b'not a pickle',))
+
+    assert cache.get('blobs', 'key') is None
+    assert cache.stats() == []
@@ -0,0 +1,23 @@
+import plotly.graph_objects as go  # Import Plotly Graph Objects for the figures to compact
+
+from payload import PayloadMeter
+
+
+# Function to build a figure with full precision floats
+def make_figure():
+    return go.Figure(data=[dict(type='bar', x=['D1', 'D2', 'D3'], y=[1 / 3, 2 / 3, 1 / 7])])
+
+
+# Check that every figure is compacted but only the first of every sample_every figures of a chart is measured
+def test_meter_measures_a_sample_of_the_figures():
+    meter = PayloadMeter(sample_every=3)
+    for _ in range(7):
+        fig = meter.compact('bar', make_figure(), decimals=2)
+        assert list(fig.data[0].y) == [0.33, 0.67, 0.14]
+    meter.compact('drilldown', make_figure())
+
+    stats = meter.stats().set_index('chart')
+    assert stats.loc['bar', 'figures'] == 7
+    assert stats.loc['bar', 'measured'] == 3  # The 1st, 4th and 7th
+    assert stats.loc['drilldown', 'measured'] == 1
+    assert (stats['KB after'] < stats['KB before']).all()
@@ -0,0 +1,49 @@
+import threading  # Import threading to wait for a reload
+
+from registry import DatasetRegistry, dataset_size
+from test_watcher import make_version
+from watcher import DatasetWatcher
+
+
+# Function to write a survey of n_rows responses as a CSV export and return its path
+def write_export(tmp_path, name, n_rows):
+    data = make_version(n_rows).data.copy()
+    data['Agree (Y/N)'] = data['Agree (Y/N)'].map({True: 'Yes', False: 'No'})  # Raw answers as in the workbook
+    path = str(tmp_path / f'{name}.csv')
+    data.to_csv(path, index=False)
+    return path
+
+
+# Check that the watcher reports every swapped in reload
+def test_watcher_calls_on_swap_after_a_reload(tmp_path):
+    path = write_export(tmp_path, 'survey', 100)
+    swapped = threading.Event()
+    watcher = DatasetWatcher(path, poll_interval=0.05, on_swap=swapped.set).start()
+    try:
+        write_export(tmp_path, 'survey', 200)
+        assert swapped.wait(10)
+        assert len(watcher.current().data) == 200
+    finally:
+        watcher.stop()
+
+
+# Check that the least recently used dataset is evicted when another one grows over the budget through a reload
+def test_registry_evicts_idle_dataset_when_a_reload_grows_over_budget(tmp_path):
+    paths = {'idle': write_export(tmp_path, 'idle', 100), 'busy': write_export(tmp_path, 'busy', 100)}
+    registry = DatasetRegistry(paths)
+    try:
+        registry.get('idle')
+        registry.get('busy')  # Most recently used
+        registry.budget_bytes = sum(dataset_size(registry.get(name)) for name in paths) + 1  # Both fit until one grows
+        assert [row['loaded'] for row in registry.stats()] == [True, True]
+
+        registry._watchers['busy'].on_swap()  # A reload that still fits evicts nothing
+        assert [row['loaded'] for row in registry.stats()] == [True, True]
+
+        write_export(tmp_path, 'busy', 400)
+        registry._watchers['busy']._current = DatasetWatcher(paths['busy']).current()  # As swapped in by the watcher
+        registry._watchers['busy'].on_swap()
+        assert {row['dataset']: row['loaded'] for row in registry.stats()} == {'idle': False, 'busy': True}
+    finally:
+        for watcher in list(registry._watchers.values()):
+            watcher.stop()
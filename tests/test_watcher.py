@@ -0,0 +1,86 @@
+import numpy as np  # Import NumPy for random row positions
+import pandas as pd  # Import pandas for the naive string matching
+import pytest  # Import pytest for parametrized filters
+
+from dataset import prepare_data
+from disk_cache import DiskCache
+from watcher import DatasetVersion, DatasetWatcher
+
+OPTIONS = ['Option 1', 'Option 2', 'Option 3', 'Option 4']  # Options of the select questions
+
+
+# Function to build a small survey with Y/N, single and multi select answers, some of them missing
+def make_version(n_rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    multi = [' | '.join(sorted(rng.choice(OPTIONS, size=rng.integers(1, 4), replace=False))) for _ in range(n_rows)]
+    data = pd.DataFrame({
+        'Programme': rng.choice(['P1', 'P2', 'P3'], n_rows),
+        'Year': rng.choice([2023, 2024], n_rows),
+        'Department': rng.choice(['D1', 'D2'], n_rows),
+        'Campus': rng.choice(['London', 'Edinburgh'], n_rows),
+        'Score': rng.integers(1, 12, n_rows).astype(float),
+        'Agree (Y/N)': rng.choice(['Yes', 'No', 'yes', 'no'], n_rows),
+        'Single select question (Single Select)': rng.choice(OPTIONS, n_rows),
+        'Multi select question (Multi Select)': multi,
+    })
+    for col in data.columns[5:]:
+        data.loc[rng.random(n_rows) < 0.1, col] = np.nan  # Unanswered questions
+    return DatasetVersion(prepare_data(data), 'test', warm=False)
+
+
+# Function to match the selected answers of a metric against the raw values of every row
+def naive_mask(data, col, selected):
+    answers = data.iloc[:, col]
+    if '(Multi Select)' in data.columns[col]:
+        chosen = answers.map(lambda x: set(o.strip() for o in x.split('|')) if isinstance(x, str) else set())
+        return chosen.map(lambda options: bool(options & set(selected))).to_numpy()
+    return answers.isin(selected).to_numpy()
+
+
+# Check the bitmap mask of every kind of answer filter against naive string matching, over all rows and some row positions
+@pytest.mark.parametrize('name, selected', [
+    ('Agree (Y/N)', [True]),
+    ('Agree (Y/N)', [True, False]),
+    ('Single select question (Single Select)', ['Option 2']),
+    ('Single select question (Single Select)', ['Option 1', 'Option 4', 'Not an option']),
+    ('Multi select question (Multi Select)', ['Option 3']),
+    ('Multi select question (Multi Select)', ['Option 1', 'Option 2']),
+    ('Multi select question (Multi Select)', []),
+])
+def test_answer_mask_matches_naive_matching(name, selected):
+    version = make_version()
+    col = version.data.columns.get_loc(name)
+    expected = naive_mask(version.data, col, selected)
+    assert version.mask({col: selected}).tolist() == expected.tolist()
+
+    rows = np.sort(np.random.default_rng(1).choice(len(version.data), size=50, replace=False))
+    assert version.mask({col: selected}, rows=rows).tolist() == expected[rows].tolist()
+
+
+# Check that answer filters combine with the division and period filters
+def test_answer_mask_combines_with_other_filters():
+    version = make_version()
+    data = version.data
+    multi = data.columns.get_loc('Multi select question (Multi Select)')
+    selections = {0: ['P1', 'P3'], 1: ['2024'], multi: ['Option 4']}
+
+    expected = data['Programme'].isin(['P1', 'P3']).to_numpy() & (data['Year'] == '2024').to_numpy()
+    expected &= naive_mask(data, multi, ['Option 4'])
+    assert version.mask(selections).tolist() == expected.tolist()
+
+
+# Check that small workbooks are kept on disk whole, and that exports loaded in chunks are not, only their aggregates
+def test_only_small_workbooks_are_kept_on_disk(tmp_path):
+    data = make_version().data.copy()
+    data['Agree (Y/N)'] = data['Agree (Y/N)'].map({True: 'Yes', False: 'No'})  # Raw answers as in the workbook
+    cache = DiskCache(str(tmp_path / 'cache'), budget_bytes=1 << 26)
+
+    workbook = str(tmp_path / 'survey.xlsx')
+    data.to_excel(workbook, index=False)
+    DatasetWatcher(workbook, disk_cache=cache)
+    assert [name for name, _, _ in cache.stats()] == ['datasets']
+
+    export = str(tmp_path / 'survey.csv')
+    data.to_csv(export, index=False)
+    DatasetWatcher(export, disk_cache=cache).current().get_default_intervals('Programme')
+    assert [(name, entries) for name, entries, _ in cache.stats()] == [('datasets', 1), ('default_intervals', 1)]
@@ -0,0 +1,221 @@
+import hashlib  # Import hashlib to name versions after their content
+import io  # Import io to parse the workbook from memory
+import json  # Import json to include the schema manifest in the version
+import os  # Import os to check the workbook on disk
+import threading  # Import threading for the background watcher
+import time  # Import time to measure how long a load took
+
+import numpy as np  # Import NumPy for the filter masks
+import pandas as pd  # Import pandas for the value indexes
+
+from aggregates import compute_intervals  # Import the interval computation used to warm new versions
+from dataset import DIVISION_CANDIDATES, PERIOD_COL, classify_columns, is_streamed, load_data, read_schema, schema_path  # Import the dataset loader
+
+POLL_INTERVAL = 2.0  # Seconds between two checks of the workbook
+HASH_BLOCK_BYTES = 1 << 20  # Bytes read at a time when hashing a large export
+
+
+# Immutable snapshot of one version of the dataset with everything derived from it
+class DatasetVersion:
+    def __init__(self, data, version, warm=True, disk_cache=None):
+        self.data = data
+        self.version = version  # Hash of the content of the workbook this snapshot was built from
+        self.disk_cache = disk_cache  # Optional DiskCache of the default aggregates, shared with other processes
+        self.boolean_cols, self.numeric_cols, self.single_select_cols, self.multi_select_cols = classify_columns(data)
+
+        # Index of the distinct values of the filter columns, used as multiselect options
+        self.values = {col: data.iloc[:, col].unique() for col in DIVISION_CANDIDATES + [PERIOD_COL]}
+        # Position of every row's value in that index, so filter states become masks through small lookup tables
+        self.codes = {col: pd.Index(values).get_indexer(data.iloc[:, col]) for col, values in self.values.items()}
+
+        # Respondents who gave each answer of every Y/N and select metric, so answer filters combine with the others as bitmaps
+        self.answer_values, self.answer_bits = {}, {}
+        for col in self.boolean_cols + self.single_select_cols + self.multi_select_cols:
+            self.answer_values[col], self.answer_bits[col] = answer_index(data.iloc[:, col], multi_select=col in self.multi_select_cols)
+
+        # Intervals of the unfiltered data per division column, the view every session starts from
+        self.default_intervals = {}
+        # Row positions of every division per division column, so the responses of a division are found without a scan
+        self.row_index = {}
+        self._lock = threading.Lock()
+        if warm:
+            for col in DIVISION_CANDIDATES:
+                self.get_default_intervals(data.columns[col])
+
+    # Function to turn a {column position: selected values} filter state into a boolean mask of the rows, or of some row positions.
+    # Filters on Y/N and select metrics keep the respondents who gave any of the selected answers
+    def mask(self, selections, rows=None):
+        mask = np.ones(len(self.data) if rows is None else len(rows), dtype=bool)
+        for col, selected in selections.items():
+            if col in self.answer_bits:
+                mask &= self._answer_mask(col, selected, rows)
+                continue
+            positions = pd.Index(self.values[col]).get_indexer(selected)
+            lookup = np.zeros(len(self.values[col]), dtype=bool)
+            lookup[positions[positions >= 0]] = True
+            mask &= lookup[self.codes[col] if rows is None else self.codes[col][rows]]
+        return mask
+
+    # Function to OR the bitmaps of the selected answers of a metric into a boolean mask of the rows, or of some row positions
+    def _answer_mask(self, col, selected, rows=None):
+        positions = pd.Index(self.answer_values[col]).get_indexer(selected)
+        bits = np.bitwise_or.reduce(self.answer_bits[col][positions[positions >= 0]], axis=0, initial=0)  # Any of the answers
+        if rows is None:
+            return np.unpackbits(bits, count=len(self.data)).astype(bool)
+        return ((bits[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)  # Only the bits of the given rows
+
+    # Function to get the row positions of every division of a division column, computed on first use
+    def get_row_index(self, col):
+        if col not in self.row_index:
+            with self._lock:
+                if col not in self.row_index:
+                    # Sorting the codes once groups the rows of each division together
+                    order = np.argsort(self.codes[col], kind='stable')
+                    bounds = np.searchsorted(self.codes[col][order], np.arange(len(self.values[col]) + 1))
+                    self.row_index[col] = {value: order[bounds[i]:bounds[i + 1]] for i, value in enumerate(self.values[col])}
+        return self.row_index[col]
+
+    # Function to get the intervals of the unfiltered data for a division column, computed on first use
+    def get_default_intervals(self, division_col):
+        if division_col not in self.default_intervals:
+            with self._lock:
+                if division_col not in self.default_intervals:
+                    stored = self.disk_cache.get('default_intervals', (self.version, division_col)) if self.disk_cache else None
+                    if stored is not None:
+                        self.default_intervals[division_col] = stored[0]
+                    else:
+                        start = time.perf_counter()
+                        self.default_intervals[division_col] = compute_intervals(
+                            self.data, division_col, self.data.columns[PERIOD_COL],
+                            self.data.columns[self.boolean_cols], self.data.columns[self.numeric_cols])
+                        if self.disk_cache:
+                            self.disk_cache.put('default_intervals', (self.version, division_col), self.default_intervals[division_col],
+                                                time.perf_counter() - start)
+        return self.default_intervals[division_col]
+
+
+# Function to index the answers of a Y/N or select metric as (answer values, one packed bitmap of the rows per answer value)
+def answer_index(answers, multi_select=False):
+    n_rows = len(answers)
+    answers = answers.reset_index(drop=True).dropna()  # Index by row position
+    if multi_select:
+        answers = answers.astype(str).str.split('|').explode().str.strip()  # One entry per selected option, like option_counts
+    codes, values = pd.factorize(answers, sort=True)
+    rows = answers.index.to_numpy()
+    bits = np.zeros((len(values), (n_rows + 7) // 8), dtype=np.uint8)  # Same layout as np.packbits
+    np.bitwise_or.at(bits, (codes, rows >> 3), (128 >> (rows & 7)).astype(np.uint8))
+    return list(values), bits
+
+
+# Function to fingerprint a file from its size and modification time
+def file_fingerprint(file_path):
+    stat = os.stat(file_path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+# Function to fingerprint a workbook together with its schema manifest, so editing either one is a new version
+def dataset_fingerprint(file_path):
+    fingerprint = file_fingerprint(file_path)
+    if os.path.exists(schema_path(file_path)):
+        fingerprint += '-' + file_fingerprint(schema_path(file_path))
+    return fingerprint
+
+
+# Background watcher that rebuilds the dataset when the workbook changes and swaps it in once complete
+class DatasetWatcher:
+    def __init__(self, file_path, poll_interval=POLL_INTERVAL, progress=None, disk_cache=None, on_swap=None):
+        self.file_path = file_path
+        self.poll_interval = poll_interval
+        self.on_swap = on_swap  # Optional function called after a reloaded version is swapped in, e.g. to re-check a memory budget
+        self.disk_cache = disk_cache  # Optional DiskCache of typed datasets, so a restarted instance skips parsing the workbook
+        self.error = None  # Last failed reload, the previous version keeps being served
+        # The first version is built synchronously, there is nothing to serve before.
+        # Its default aggregates are left to first use so the dashboard can be shown sooner
+        self._current, self._fingerprint = self._build(warm=False, progress=progress)
+        self._thread = None
+        self._stopped = threading.Event()
+
+    # Function to get the latest complete version (a plain attribute read, never blocks on a reload)
+    def current(self):
+        return self._current
+
+    # Function to start polling the workbook in a daemon thread
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='dataset-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    # Function to stop polling the workbook, the current version can still be read
+    def stop(self):
+        self._stopped.set()
+
+    # Function to read the workbook and build a complete version from it, reporting (fraction, stage) to progress.
+    # Returns the version and the fingerprint of the file it was read from
+    def _build(self, warm=True, progress=None):
+        progress = progress or (lambda fraction, stage: None)
+        progress(0.0, "Reading the workbook")
+        fingerprint = dataset_fingerprint(self.file_path)
+        schema = read_schema(self.file_path)  # Checked once per version, before reading the responses
+        streamed = is_streamed(self.file_path)
+
+        # Versions are named after the content, so the same workbook is the same version in every process and after restarts
+        digest = hashlib.sha1(json.dumps(schema, sort_keys=True).encode())
+        content = None
+        with open(self.file_path, 'rb') as f:
+            if streamed:
+                for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+                    digest.update(block)
+            else:
+                content = f.read()
+                digest.update(content)
+        version_id = digest.hexdigest()[:16]
+
+        # Large exports are not kept on disk: storing or reading one pickled blob would copy the whole frame in memory,
+        # the peak their chunked loading avoids. Their default aggregates are still cached
+        persist = self.disk_cache is not None and not streamed
+        stored = self.disk_cache.get('datasets', (version_id,)) if persist else None
+        if stored is not None:
+            data = stored[0]
+        else:
+            start = time.perf_counter()
+            if streamed:
+                # Large exports are typed chunk by chunk straight from the file, never held raw in memory
+                data = load_data(self.file_path, schema, progress=lambda fraction: progress(0.9 * fraction, "Reading the workbook"))
+            else:
+                data = load_data(io.BytesIO(content), schema)
+            if persist:
+                self.disk_cache.put('datasets', (version_id,), data, time.perf_counter() - start)
+        if dataset_fingerprint(self.file_path) != fingerprint:
+            raise OSError(f"{self.file_path} changed while it was being read")
+        progress(0.9, "Indexing the responses")
+        version = DatasetVersion(data, version_id, warm=warm, disk_cache=self.disk_cache)
+        progress(1.0, "Done")
+        return version, fingerprint
+
+    def _run(self):
+        pending = None  # Fingerprint seen at the previous poll that differs from the current version
+        failed = None  # Fingerprint of the last workbook that could not be loaded
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                fingerprint = dataset_fingerprint(self.file_path)
+            except OSError:
+                continue  # The workbook is being replaced
+            if fingerprint == self._fingerprint or fingerprint == failed:
+                pending = None
+                continue
+            if fingerprint != pending:
+                pending = fingerprint  # Wait until the file has stopped changing for one interval
+                continue
+            try:
+                version, fingerprint = self._build()
+            except Exception as e:  # A half-written or invalid workbook, keep serving the previous version
+                self.error = e
+                failed = fingerprint
+                pending = None
+                continue
+            self._current, self._fingerprint = version, fingerprint  # Swap in the new version
+            self.error = None
+            pending = None
+            if self.on_swap:
+                self.on_swap()